@@ -0,0 +1,464 @@
+"""
+Headway, prediction drift and service gap statistics over the arrivals log.
+
+HistoryStore decodes the log files written by arrivals_log.py into NumPy
+columns once. Rotated files never change, and the file being written is
+read on from where the last load stopped, so a query only pays for the
+vectorized maths over its window, never for parsing.
+
+A trip's arrival at a stop is taken to be its last prediction there, as
+long as that prediction was made within ARRIVAL_TOLERANCE of the time it
+predicted (trips that just dropped out of the feed are ignored). From
+those arrivals:
+
+    headways  time between consecutive arrivals of a route at a stop
+    drift     how far earlier predictions were from the arrival, by lead time
+    gaps      headways much longer than the route's usual one at that stop,
+              excluding stretches where nothing was being recorded
+"""
+import os
+import threading
+import time
+import numpy as np
+import arrivals_log
+
+# One prediction record of arrivals_log, as laid out on disk
+RECORD_DTYPE = np.dtype([
+    ('tag', 'u1'), ('feed_timestamp', '<u4'), ('predicted', '<u4'),
+    ('stop', '<u4'), ('route', '<u4'), ('trip', '<u4'),
+])
+RUN_SCAN = 512             # Records checked at a time for the end of a run of predictions
+
+ARRIVAL_TOLERANCE = 120    # Seconds between a trip's last prediction and its arrival for it to count
+TRIP_GAP = 3 * 3600        # A trip ID seen again after this long is another day's run
+LEAD_BINS = (0, 2, 5, 10, 15, 20, 30)  # Minutes of lead time the drift stats are grouped by
+GAP_FACTOR = 2.0           # A gap is a headway this many times the usual one...
+GAP_MIN_SECONDS = 600      # ...and at least this long
+OUTAGE_SECONDS = 300       # Feed timestamps further apart than this mean nothing was recorded
+HEADWAY_LIMIT = 6 * 3600   # Longest headway the median/p90 resolve (seconds)
+ERROR_LIMIT = 3600         # Largest prediction error the median/p90 resolve (seconds)
+
+
+def _decode(data, strings):
+    """
+    Decode the prediction records in a chunk of log file.
+
+    Back-to-back predictions are fixed-size, so each run between string
+    definitions is read as one structured array instead of record by record.
+
+    Args:
+        data: Bytes of the log, starting at a record boundary
+        strings: The file's string table so far; extended in place
+
+    Returns:
+        Tuple of (structured array of predictions, bytes consumed); a record
+        cut short at the end of data is left for the next call
+    """
+    tags = np.frombuffer(data, dtype=np.uint8)
+    size = RECORD_DTYPE.itemsize
+    runs = []
+    offset = 0
+
+    while offset < len(data):
+        tag = data[offset]
+        if tag == arrivals_log.TAG_STRING:
+            if offset + arrivals_log.STRING.size > len(data):
+                break
+            _, length = arrivals_log.STRING.unpack_from(data, offset)
+            start = offset + arrivals_log.STRING.size
+            if start + length > len(data):
+                break
+            strings.append(data[start:start + length].decode('utf-8'))
+            offset = start + length
+        elif tag == arrivals_log.TAG_PREDICTION:
+            complete = (len(data) - offset) // size
+            count = 0
+            while count < complete:
+                window = tags[offset + count * size:offset + min(complete, count + RUN_SCAN) * size:size]
+                others = np.flatnonzero(window != arrivals_log.TAG_PREDICTION)
+                if others.size:
+                    count += int(others[0])
+                    break
+                count += window.size
+            if count == 0:
+                break
+            runs.append(np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=offset))
+            offset += count * size
+        else:
+            raise ValueError(f"Unknown arrivals log record tag {tag}")
+
+    records = np.concatenate(runs) if runs else np.empty(0, dtype=RECORD_DTYPE)
+    return records, offset
+
+
+class _LogColumns:
+    """Columns decoded so far from one log file, with the state to read on."""
+
+    def __init__(self):
+        self.offset = 0
+        self.strings = []
+        self.codes = np.empty(0, dtype=np.uint32)  # File string number -> HistoryStore code
+        self.columns = None
+
+
+class HistoryStore:
+    """Predictions from an arrivals log directory, as NumPy columns."""
+
+    COLUMNS = ('feed_timestamp', 'predicted', 'stop', 'route', 'trip')
+
+    def __init__(self, directory, max_age, refresh_interval=60):
+        """
+        Args:
+            directory: ARRIVALS_LOG_DIR
+            max_age: Seconds of history kept loaded (the longest window any query may ask for)
+            refresh_interval: Minimum seconds between checks for new records
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.names = []   # Code -> stop, route or trip ID
+        self._codes = {}  # ID -> code
+        self._files = {}  # path -> _LogColumns
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._columns = None  # Every file's columns concatenated, as of _columns_version
+        self._columns_version = None
+        # Bumped whenever records are added or dropped
+        self.version = 0
+
+    def code(self, name):
+        """Return the code for an ID, or None if it has never been recorded."""
+        return self._codes.get(name)
+
+    def _code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def refresh(self):
+        """
+        Load records added since the last refresh from files written in the last max_age seconds.
+
+        Older files are dropped from memory. Checks at most once per
+        refresh_interval; queries narrow to their own window in window().
+        """
+        with self._lock:
+            if time.time() - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = time.time()
+            since = self._checked_at - self.max_age
+
+            wanted = []
+            for path in arrivals_log.log_files(self.directory):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_mtime >= since:
+                    wanted.append((path, stat.st_size))
+
+            changed = False
+            for path in set(self._files) - {path for path, _ in wanted}:
+                del self._files[path]
+                changed = True
+
+            for path, size in wanted:
+                state = self._files.setdefault(path, _LogColumns())
+                if size > state.offset:
+                    changed |= self._load(path, state)
+
+            if changed:
+                self.version += 1
+
+    def _load(self, path, state):
+        """Decode a file from where the last load stopped. Returns True if records were added."""
+        with open(path, 'rb') as f:
+            f.seek(state.offset)
+            data = f.read()
+
+        if state.offset == 0:
+            if len(data) < arrivals_log.HEADER.size:
+                return False
+            magic, version = arrivals_log.HEADER.unpack_from(data, 0)
+            if magic != arrivals_log.MAGIC or version != arrivals_log.VERSION:
+                print(f"Skipping {path}: not a version {arrivals_log.VERSION} arrivals log")
+                state.offset = float('inf')
+                return False
+            data = data[arrivals_log.HEADER.size:]
+            state.offset = arrivals_log.HEADER.size
+
+        try:
+            records, consumed = _decode(data, state.strings)
+        except ValueError as e:
+            print(f"Skipping the rest of {path}: {e}")
+            state.offset = float('inf')
+            return False
+        state.offset += consumed
+
+        if len(state.strings) > len(state.codes):
+            new_codes = [self._code(name) for name in state.strings[len(state.codes):]]
+            state.codes = np.concatenate([state.codes, np.array(new_codes, dtype=np.uint32)])
+
+        # Departure-only stop times were once logged with a predicted time of 0
+        records = records[records['predicted'] > 0]
+        if not len(records):
+            return False
+
+        columns = {
+            'feed_timestamp': records['feed_timestamp'].copy(),
+            'predicted': records['predicted'].copy(),
+            'stop': state.codes[records['stop']],
+            'route': state.codes[records['route']],
+            'trip': state.codes[records['trip']],
+        }
+        if state.columns is not None:
+            columns = {name: np.concatenate([state.columns[name], columns[name]]) for name in self.COLUMNS}
+        state.columns = columns
+        return True
+
+    def window(self, since, stop_ids=None):
+        """
+        Predictions made at or after `since`, optionally only at some stops.
+
+        Returns:
+            Dict of equal-length arrays: feed_timestamp, predicted, stop, route, trip
+        """
+        with self._lock:
+            if self._columns_version != self.version:
+                parts = [state.columns for state in self._files.values() if state.columns is not None]
+                self._columns = {
+                    name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype=np.uint32)
+                    for name in self.COLUMNS
+                }
+                self._columns_version = self.version
+            columns = self._columns
+
+        mask = columns['feed_timestamp'] >= since
+        if stop_ids is not None:
+            codes = [code for code in map(self.code, stop_ids) if code is not None]
+            mask &= np.isin(columns['stop'], np.array(codes, dtype=np.uint32))
+        return {name: values[mask] for name, values in columns.items()}
+
+
+def _group_stats(group, values, groups, limit, quantile=0.9):
+    """
+    Count, mean, median and a quantile of non-negative integer values per group.
+
+    The order statistics are read off a per-group histogram of the values
+    (clipped at `limit`) instead of sorting them.
+
+    Args:
+        group: Group number (0 to groups - 1) of each value
+        values: Non-negative integers, e.g. seconds
+        groups: Number of groups
+        limit: Largest value the median and quantile can resolve
+
+    Returns:
+        Dict of arrays indexed by group number: count, mean, median, quantile
+    """
+    count = np.bincount(group, minlength=groups)
+    mean = np.bincount(group, weights=values, minlength=groups) / np.maximum(count, 1)
+
+    width = limit + 1
+    histogram = np.bincount(group * width + np.minimum(values, limit), minlength=groups * width)
+    cumulative = histogram.reshape(groups, width).cumsum(axis=1)
+
+    def value_at(rank):
+        # Smallest value with more than `rank` values at or below it
+        return (cumulative <= rank[:, None]).sum(axis=1)
+
+    return {
+        'count': count,
+        'mean': mean,
+        'median': (value_at((count - 1) // 2) + value_at(count // 2)) / 2,
+        'quantile': value_at(np.floor(quantile * (count - 1)).astype(np.int64)),
+    }
+
+
+def _pair_key(high, low):
+    return (high.astype(np.int64) << 32) | low.astype(np.int64)
+
+
+def trip_arrivals(columns):
+    """
+    Collapse predictions into one arrival per trip run at each stop.
+
+    Relies on records being appended in time order: a stable sort by
+    (stop, trip) then leaves each trip's predictions in the order they
+    were made, with its last one at the end.
+
+    Returns:
+        Tuple of (arrivals, group): arrivals is a dict of stop, route and
+        arrival (epoch) arrays; group gives each input prediction's row in
+        arrivals, or -1 if its trip run never arrived
+    """
+    count = len(columns['stop'])
+    if not count:
+        empty = np.empty(0, dtype=np.int64)
+        return {'stop': empty, 'route': empty, 'arrival': empty}, empty
+
+    key = _pair_key(columns['stop'], columns['trip'])
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    seen = columns['feed_timestamp'][order].astype(np.int64)
+
+    new_run = np.empty(count, dtype=bool)
+    new_run[0] = True
+    new_run[1:] = (key[1:] != key[:-1]) | (np.diff(seen) > TRIP_GAP)
+    run = np.cumsum(new_run) - 1
+    last = np.flatnonzero(np.r_[new_run[1:], True])
+
+    final = order[last]
+    arrival = columns['predicted'][final].astype(np.int64)
+    lead = arrival - seen[last]
+    arrived = (lead >= 0) & (lead <= ARRIVAL_TOLERANCE)
+
+    row = np.full(len(last), -1, dtype=np.int64)
+    row[arrived] = np.arange(np.count_nonzero(arrived))
+    group = np.empty(count, dtype=np.int64)
+    group[order] = row[run]
+
+    arrivals = {
+        'stop': columns['stop'][final][arrived],
+        'route': columns['route'][final][arrived],
+        'arrival': arrival[arrived],
+    }
+    return arrivals, group
+
+
+def _headways_by_pair(arrivals):
+    """
+    Consecutive arrivals of the same route at the same stop.
+
+    Returns:
+        Tuple of (pairs, pair, start, end): pairs holds the distinct
+        (stop, route) keys, pair each headway's index into them
+    """
+    order = np.lexsort((arrivals['arrival'], arrivals['route'], arrivals['stop']))
+    stop, route, arrival = arrivals['stop'][order], arrivals['route'][order], arrivals['arrival'][order]
+    same = (stop[1:] == stop[:-1]) & (route[1:] == route[:-1]) & (arrival[1:] > arrival[:-1])
+    pairs, pair = np.unique(_pair_key(stop[1:][same], route[1:][same]), return_inverse=True)
+    return pairs, pair.reshape(-1), arrival[:-1][same], arrival[1:][same]
+
+
+def headways(columns, names):
+    """
+    Headway statistics per stop and route.
+
+    Returns:
+        List of {stop, route, trains, median_min, mean_min, p90_min}
+    """
+    pairs, pair, start, end = _headways_by_pair(trip_arrivals(columns)[0])
+    if not len(pairs):
+        return []
+
+    stats = _group_stats(pair, end - start, len(pairs), HEADWAY_LIMIT)
+    return [
+        {
+            'stop': names[key >> 32],
+            'route': names[key & 0xFFFFFFFF],
+            'trains': int(count) + 1,
+            'median_min': round(float(median) / 60, 1),
+            'mean_min': round(float(mean) / 60, 1),
+            'p90_min': round(float(p90) / 60, 1),
+        }
+        for key, count, median, mean, p90 in zip(
+            pairs.tolist(), stats['count'], stats['median'], stats['mean'], stats['quantile']
+        )
+    ]
+
+
+def drift(columns, names):
+    """
+    Prediction error per route, by how far ahead the prediction was made.
+
+    Error is arrival minus predicted time: positive means the train came
+    later than the board said.
+
+    Returns:
+        List of {route, lead_min, lead_max_min, predictions, mean_error_s,
+        median_abs_error_s, p90_abs_error_s}
+    """
+    arrivals, group = trip_arrivals(columns)
+    known = np.flatnonzero(group >= 0)
+    if not len(known):
+        return []
+
+    rows = group[known]
+    predicted = columns['predicted'][known].astype(np.int64)
+    lead = predicted - columns['feed_timestamp'][known].astype(np.int64)
+    bins = np.searchsorted(np.array(LEAD_BINS) * 60, lead, side='right') - 1
+    in_range = (bins >= 0) & (bins < len(LEAD_BINS) - 1)
+
+    # Routes numbered densely from the (few) arrivals, then one group per route and lead bin
+    routes, route_number = np.unique(arrivals['route'], return_inverse=True)
+    bin_count = len(LEAD_BINS) - 1
+    groups = len(routes) * bin_count
+    group_number = (route_number.reshape(-1)[rows] * bin_count + bins)[in_range]
+    error = (arrivals['arrival'][rows] - predicted)[in_range]
+
+    signed = np.bincount(group_number, weights=error, minlength=groups)
+    absolute = _group_stats(group_number, np.abs(error), groups, ERROR_LIMIT)
+
+    return [
+        {
+            'route': names[routes[number // bin_count]],
+            'lead_min': LEAD_BINS[number % bin_count],
+            'lead_max_min': LEAD_BINS[number % bin_count + 1],
+            'predictions': int(absolute['count'][number]),
+            'mean_error_s': round(float(signed[number] / absolute['count'][number]), 1),
+            'median_abs_error_s': round(float(absolute['median'][number]), 1),
+            'p90_abs_error_s': round(float(absolute['quantile'][number]), 1),
+        }
+        for number in np.flatnonzero(absolute['count']).tolist()
+    ]
+
+
+def gaps(columns, names, limit=50):
+    """
+    Service gaps: headways over GAP_FACTOR times the route's median at that
+    stop (and at least GAP_MIN_SECONDS), most recent first.
+
+    Gaps overlapping a stretch with no recorded feed updates are left out,
+    since the trains may have run while nothing was listening.
+
+    Returns:
+        List of {stop, route, start, end, minutes, usual_minutes}
+    """
+    pairs, pair, start, end = _headways_by_pair(trip_arrivals(columns)[0])
+    if not len(pairs):
+        return []
+
+    headway = end - start
+    usual = _group_stats(pair, headway, len(pairs), HEADWAY_LIMIT)['median'][pair]
+    is_gap = (headway > GAP_FACTOR * usual) & (headway >= GAP_MIN_SECONDS)
+
+    # Drop gaps that overlap a recording outage
+    seen = np.unique(columns['feed_timestamp']).astype(np.int64)
+    silent = np.flatnonzero(np.diff(seen) > OUTAGE_SECONDS)
+    if len(silent):
+        outage_start, outage_end = seen[silent], seen[silent + 1]
+        first = np.searchsorted(outage_end, start, side='right')
+        candidates = first < len(outage_start)
+        overlaps = np.zeros(len(start), dtype=bool)
+        overlaps[candidates] = outage_start[first[candidates]] < end[candidates]
+        is_gap &= ~overlaps
+
+    found = np.flatnonzero(is_gap)
+    found = found[np.argsort(-start[found], kind='stable')][:limit]
+    return [
+        {
+            'stop': names[pairs[pair[i]] >> 32],
+            'route': names[pairs[pair[i]] & 0xFFFFFFFF],
+            'start': int(start[i]),
+            'end': int(end[i]),
+            'minutes': round(float(headway[i]) / 60, 1),
+            'usual_minutes': round(float(usual[i]) / 60, 1),
+        }
+        for i in found.tolist()
+    ]
+
+
+QUERIES = {'headways': headways, 'drift': drift, 'gaps': gaps}
@@ -1,9 +1,19 @@
+import hashlib
 import json
 import os
+import threading
+import time
 import uuid
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
-from mta_client import MTAClient, get_lines_for_station
+import analytics
+import config as settings
+import metrics
+import timing
+from led_renderer import HEIGHT as LED_HEIGHT, WIDTH as LED_WIDTH, FrameRenderer, page_from_arrivals
+from mta_client import ALERTS_URL, MTAClient, get_lines_for_station
+from station_search import StationSearchIndex
+from station_store import StationConfigStore
 from stations import STATIONS
 
 app = Flask(__name__, static_folder='frontend/dist', static_url_path='')
@@ -11,23 +21,58 @@ CORS(app)  # Enable CORS for development
 
 client = MTAClient()
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'station_config.json')
+station_store = StationConfigStore(CONFIG_FILE)
+station_index = StationSearchIndex(STATIONS, get_lines_for_station)
 
 
 def load_station_config():
-    """Load station configuration from JSON file."""
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-    return {"stations": []}
+    """Return the cached station configuration (read-only; edit via station_store.update())."""
+    with timing.phase('config'):
+        return station_store.load()
 
 
-def save_station_config(config):
-    """Save station configuration to JSON file."""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+# Keep every configured station's feed warm in the background so request
+# handlers only ever read the latest snapshot
+client.watch_stations(load_station_config()['stations'], replace=True)
+if settings.BACKGROUND_REFRESH:
+    # Serve the last good data saved on disk until the first fetches land
+    client.restore_snapshots()
+    client.start_background_refresh()
+
+# Sampled stacks of slow requests, when PROFILE_SLOW_MS is set
+profiler = timing.SamplingProfiler(settings.PROFILE_SLOW_MS, settings.PROFILE_DIR) if settings.PROFILE_SLOW_MS else None
+
+
+# --- Request timing ---
+
+@app.before_request
+def start_request_timing():
+    g.timing_token = timing.start()
+    if profiler:
+        profiler.track()
+
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's phases (config, cache, build, network, parse, serialize) as Server-Timing."""
+    token = g.pop('timing_token', None)
+    if token is None:
+        return response
+
+    timings = timing.stop(token)
+    response.headers['Server-Timing'] = timing.server_timing(timings)
+
+    # Streams outlive this hook; only whole responses are profiled
+    if profiler and not response.is_streamed:
+        profiler.finish(request.endpoint or request.path, timings.elapsed())
+    return response
+
+
+@app.teardown_request
+def stop_request_timing(exc):
+    # after_request is skipped when a view raises
+    if profiler:
+        profiler.untrack()
 
 
 # --- API Endpoints ---
@@ -51,22 +96,22 @@ def add_station():
     direction = data.get('direction', 'N')
     name = data.get('name', STATIONS.get(station_id, station_id))
 
-    config = load_station_config()
+    with station_store.update() as config:
+        # Check for duplicates
+        for station in config['stations']:
+            if station['id'] == station_id and station['direction'] == direction:
+                return jsonify({'error': 'Station already exists'}), 409
 
-    # Check for duplicates
-    for station in config['stations']:
-        if station['id'] == station_id and station['direction'] == direction:
-            return jsonify({'error': 'Station already exists'}), 409
+        new_station = {
+            'id': station_id,
+            'direction': direction,
+            'name': name,
+            'uuid': str(uuid.uuid4())  # Unique ID for frontend
+        }
 
-    new_station = {
-        'id': station_id,
-        'direction': direction,
-        'name': name,
-        'uuid': str(uuid.uuid4())  # Unique ID for frontend
-    }
+        config['stations'].append(new_station)
 
-    config['stations'].append(new_station)
-    save_station_config(config)
+    client.watch_stations([new_station])
 
     return jsonify(new_station), 201
 
@@ -74,59 +119,57 @@ def add_station():
 @app.route('/api/stations/<station_uuid>', methods=['DELETE'])
 def delete_station(station_uuid):
     """Remove a station from monitoring."""
-    config = load_station_config()
-
-    # Find and remove station by UUID or by id_direction
-    original_length = len(config['stations'])
-    config['stations'] = [
-        s for s in config['stations']
-        if s.get('uuid') != station_uuid and f"{s['id']}_{s['direction']}" != station_uuid
-    ]
+    with station_store.update() as config:
+        # Find and remove station by UUID or by id_direction
+        original_length = len(config['stations'])
+        config['stations'] = [
+            s for s in config['stations']
+            if s.get('uuid') != station_uuid and f"{s['id']}_{s['direction']}" != station_uuid
+        ]
 
-    if len(config['stations']) == original_length:
-        return jsonify({'error': 'Station not found'}), 404
+        if len(config['stations']) == original_length:
+            return jsonify({'error': 'Station not found'}), 404
 
-    save_station_config(config)
     return jsonify({'success': True}), 200
 
 
 @app.route('/api/stations/<station_uuid>/main', methods=['POST'])
 def set_main_station(station_uuid):
     """Set a station as the main station."""
-    config = load_station_config()
-
-    found = False
-    for station in config['stations']:
-        # Match by UUID or by id_direction for legacy stations
-        station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
-        if station_key == station_uuid:
-            station['isMain'] = True
-            # Add UUID if missing
-            if not station.get('uuid'):
-                station['uuid'] = str(uuid.uuid4())
-            found = True
-        else:
-            station['isMain'] = False
+    with station_store.update() as config:
+        found = False
+        for station in config['stations']:
+            # Match by UUID or by id_direction for legacy stations
+            station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
+            if station_key == station_uuid:
+                found = True
+
+        if not found:
+            return jsonify({'error': 'Station not found'}), 404
+
+        for station in config['stations']:
+            station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
+            if station_key == station_uuid:
+                station['isMain'] = True
+                # Add UUID if missing
+                if not station.get('uuid'):
+                    station['uuid'] = str(uuid.uuid4())
+            else:
+                station['isMain'] = False
 
-    if not found:
-        return jsonify({'error': 'Station not found'}), 404
-
-    save_station_config(config)
     return jsonify({'success': True}), 200
 
 
 @app.route('/api/stations/<station_uuid>/main', methods=['DELETE'])
 def unset_main_station(station_uuid):
     """Remove main station status."""
-    config = load_station_config()
+    with station_store.update() as config:
+        for station in config['stations']:
+            # Match by UUID or by id_direction for legacy stations
+            station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
+            if station_key == station_uuid:
+                station['isMain'] = False
 
-    for station in config['stations']:
-        # Match by UUID or by id_direction for legacy stations
-        station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
-        if station_key == station_uuid:
-            station['isMain'] = False
-
-    save_station_config(config)
     return jsonify({'success': True}), 200
 
 
@@ -139,20 +182,18 @@ def set_station_direction(station_uuid):
     if new_direction not in ['N', 'S', 'all']:
         return jsonify({'error': 'Direction must be N, S, or all'}), 400
 
-    config = load_station_config()
-
-    found = False
-    for station in config['stations']:
-        station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
-        if station_key == station_uuid:
-            station['direction'] = new_direction
-            found = True
-            break
+    with station_store.update() as config:
+        found = False
+        for station in config['stations']:
+            station_key = station.get('uuid') or f"{station['id']}_{station['direction']}"
+            if station_key == station_uuid:
+                station['direction'] = new_direction
+                found = True
+                break
 
-    if not found:
-        return jsonify({'error': 'Station not found'}), 404
+        if not found:
+            return jsonify({'error': 'Station not found'}), 404
 
-    save_station_config(config)
     return jsonify({'success': True}), 200
 
 
@@ -165,57 +206,43 @@ def reorder_stations():
     if not new_order:
         return jsonify({'error': 'Order array is required'}), 400
 
-    config = load_station_config()
+    with station_store.update() as config:
+        # Create a map of uuid -> station
+        station_map = {}
+        for station in config['stations']:
+            key = station.get('uuid') or f"{station['id']}_{station['direction']}"
+            station_map[key] = station
 
-    # Create a map of uuid -> station
-    station_map = {}
-    for station in config['stations']:
-        key = station.get('uuid') or f"{station['id']}_{station['direction']}"
-        station_map[key] = station
+        # Reorder stations based on the new order
+        reordered = []
+        for uuid in new_order:
+            if uuid in station_map:
+                reordered.append(station_map[uuid])
+                del station_map[uuid]
 
-    # Reorder stations based on the new order
-    reordered = []
-    for uuid in new_order:
-        if uuid in station_map:
-            reordered.append(station_map[uuid])
-            del station_map[uuid]
+        # Append any stations not in the order list (shouldn't happen, but safety)
+        for station in station_map.values():
+            reordered.append(station)
 
-    # Append any stations not in the order list (shouldn't happen, but safety)
-    for station in station_map.values():
-        reordered.append(station)
-
-    config['stations'] = reordered
-    save_station_config(config)
+        config['stations'] = reordered
 
     return jsonify({'success': True}), 200
 
 
 @app.route('/api/stations/available', methods=['GET'])
 def get_available_stations():
-    """Search available stations from stations.py."""
-    query = request.args.get('q', '').lower()
-
-    results = []
-    for station_id, name in STATIONS.items():
-        if query in name.lower() or query in station_id.lower():
-            results.append({
-                'id': station_id,
-                'name': name,
-                'lines': get_lines_for_station(station_id)
-            })
+    """Search available stations from stations.py, prefix matches first."""
+    query = request.args.get('q', '')
+    return jsonify(station_index.search(query, limit=50))
 
-    # Sort by name and limit results
-    results.sort(key=lambda x: x['name'])
-    return jsonify(results[:50])
-
-
-@app.route('/api/arrivals', methods=['GET'])
-def get_arrivals():
-    """Get arrivals for all configured stations."""
-    config = load_station_config()
 
+def build_arrivals(config):
+    """Build the /api/arrivals payload for a station configuration."""
     if not config['stations']:
-        return jsonify({})
+        return {}
+
+    # Pick up stations added (or removed) by other workers since startup
+    client.watch_stations(config['stations'], replace=True)
 
     # Build list of station configs, expanding "all" direction to N and S
     expanded_configs = []
@@ -257,7 +284,8 @@ def get_arrivals():
                 'direction': 'all',
                 'name': station['name'],
                 'isMain': station.get('isMain', False),
-                'arrivals': all_arrivals[:10]
+                'arrivals': all_arrivals[:10],
+                'stale': results.get(key_n, {}).get('stale', False) or results.get(key_s, {}).get('stale', False)
             })
         else:
             key = f"{station['id']}_{direction}"
@@ -268,17 +296,21 @@ def get_arrivals():
                 'direction': direction,
                 'name': station['name'],
                 'isMain': station.get('isMain', False),
-                'arrivals': station_data.get('arrivals', [])
+                'arrivals': station_data.get('arrivals', []),
+                'stale': station_data.get('stale', False)
             })
 
-    return jsonify(response)
+    return response
 
 
-@app.route('/api/alerts', methods=['GET'])
-def get_alerts():
-    """Get service alerts for configured stations' lines."""
-    config = load_station_config()
+@app.route('/api/arrivals', methods=['GET'])
+def get_arrivals():
+    """Get arrivals for all configured stations."""
+    return snapshot_response('arrivals')
+
 
+def build_alerts(config):
+    """Build the /api/alerts payload for a station configuration."""
     # Extract unique lines from all configured stations
     lines = set()
     for station in config['stations']:
@@ -287,9 +319,280 @@ def get_alerts():
 
     # Fetch alerts filtered to relevant lines (or all if no stations configured)
     lines_filter = list(lines) if lines else None
-    alerts = client.fetch_service_alerts(lines_filter)
+    return client.fetch_service_alerts(lines_filter)
 
-    return jsonify(alerts)
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    """Get service alerts for configured stations' lines."""
+    return snapshot_response('alerts')
+
+
+# --- Live updates ---
+
+# Payloads shared by every request and stream: {name: (version, data, json_bytes, etag)}
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+STREAM_KEEPALIVE = 15  # Seconds between SSE comments that keep idle proxies from closing the stream
+# Each open stream holds a server thread, so cap them to leave threads for the API
+_stream_slots = threading.BoundedSemaphore(settings.STREAM_MAX_CLIENTS)
+
+
+def build_snapshot(name):
+    """
+    Return the arrivals or alerts snapshot for the current data.
+
+    The snapshot is built at most once per (config version, client snapshot
+    version), however many clients are polling or listening.
+
+    Returns:
+        Tuple of (version, data, JSON bytes, strong ETag derived from those bytes)
+    """
+    with timing.phase('config'):
+        version = (station_store.version, client.snapshot_version())
+
+    # Alerts are only polled while someone is looking at them, even when
+    # this request is answered from the cached snapshot
+    if name == 'alerts':
+        client.note_demand([ALERTS_URL])
+
+    with _snapshots_lock:
+        with timing.phase('cache'):
+            cached = _snapshots.get(name)
+        if cached and cached[0] == version:
+            return cached
+
+        build = build_arrivals if name == 'arrivals' else build_alerts
+        config = load_station_config()
+        with timing.phase('build'):
+            data = build(config)
+        with timing.phase('serialize'):
+            payload = json.dumps(data, separators=(',', ':')).encode()
+            etag = hashlib.sha1(payload).hexdigest()[:20]
+        snapshot = _snapshots[name] = (version, data, payload, etag)
+
+    return snapshot
+
+
+def get_snapshot(name):
+    """Return (JSON bytes, ETag) of the current arrivals or alerts snapshot."""
+    _, _, payload, etag = build_snapshot(name)
+    return payload, etag
+
+
+def snapshot_response(name):
+    """Serve a snapshot with its ETag, answering a matching If-None-Match with 304."""
+    payload, etag = get_snapshot(name)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(payload, mimetype='application/json')
+
+    response.set_etag(etag)
+    # Let browsers and the tunnel cache it, but revalidate on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """
+    Server-Sent Events stream that pushes arrivals/alerts only when they change.
+
+    Answers 503 once STREAM_MAX_CLIENTS streams are open in this worker;
+    clients should fall back to polling /api/arrivals and /api/alerts.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many live streams; poll /api/arrivals instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_KEEPALIVE)
+        return response
+
+    def events():
+        sent = {}
+        data_version = client.data_version
+
+        while True:
+            for name in ('arrivals', 'alerts'):
+                payload, _ = get_snapshot(name)
+                if sent.get(name) != payload:
+                    sent[name] = payload
+                    yield b'event: ' + name.encode() + b'\ndata: ' + payload + b'\n\n'
+
+            # Wake on new data, or at the next refresh window so minutes count down
+            timeout = min(STREAM_KEEPALIVE, client.snapshot_expires_in())
+            new_version = client.wait_for_change(data_version, timeout=timeout)
+            if new_version == data_version:
+                yield b': keepalive\n\n'
+            data_version = new_version
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, whether or not it was ever read
+    response.call_on_close(_stream_slots.release)
+    return response
+
+
+# --- LED frames ---
+
+# Rendered frames by (stations, direction): {key: (arrivals version, frame_bytes, etag)}
+_frames = {}
+_frames_lock = threading.Lock()
+_frame_renderer = None
+LED_FRAME_CACHE_SIZE = 32  # Distinct station/direction selections kept
+
+
+def get_frame_renderer():
+    """Return the shared FrameRenderer, loading its fonts on first use (raises OSError if missing)."""
+    global _frame_renderer
+    if _frame_renderer is None:
+        _frame_renderer = FrameRenderer()
+    return _frame_renderer
+
+
+@app.route('/api/led/frame', methods=['GET'])
+def get_led_frame():
+    """
+    The 64x32 display for the current arrivals as a raw RGB frame.
+
+    Query params:
+        stations: Comma-separated station uuids (default: every station)
+        direction: 'all' (default), 'N' or 'S'
+
+    The body is WIDTH * HEIGHT * 3 bytes, row-major from the top left. Frames
+    are rendered once per arrivals snapshot and selection, and served with
+    an ETag so unchanged frames cost a 304.
+    """
+    direction = request.args.get('direction', 'all')
+    if direction not in ('all', 'N', 'S'):
+        return jsonify({'error': 'direction must be all, N or S'}), 400
+
+    stations = request.args.get('stations')
+    station_uuids = frozenset(filter(None, stations.split(','))) if stations is not None else None
+    key = (station_uuids, direction)
+
+    version, data, _, _ = build_snapshot('arrivals')
+
+    with _frames_lock:
+        cached = _frames.get(key)
+        if cached and cached[0] == version:
+            frame, etag = cached[1], cached[2]
+        else:
+            try:
+                renderer = get_frame_renderer()
+            except OSError as e:
+                print(f"LED fonts unavailable: {e}")
+                return jsonify({'error': 'LED fonts not available on the server'}), 503
+
+            with timing.phase('render'):
+                frame = renderer.render(page_from_arrivals(data, station_uuids, direction))
+            etag = hashlib.sha1(frame).hexdigest()[:20]
+
+            _frames.pop(key, None)
+            if len(_frames) >= LED_FRAME_CACHE_SIZE:
+                _frames.pop(next(iter(_frames)))
+            _frames[key] = (version, frame, etag)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(frame, mimetype='application/octet-stream')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-LED-Width'] = str(LED_WIDTH)
+    response.headers['X-LED-Height'] = str(LED_HEIGHT)
+    return response
+
+
+# --- Analytics ---
+
+# Recorded predictions as NumPy columns, when the arrivals log is enabled
+history = analytics.HistoryStore(
+    settings.ARRIVALS_LOG_DIR, settings.ANALYTICS_MAX_HOURS * 3600, settings.ANALYTICS_REFRESH
+) if settings.ARRIVALS_LOG_DIR else None
+
+# Results by (query, hours, stops): {key: (history version, minute, result)}
+_analytics = {}
+_analytics_lock = threading.Lock()
+ANALYTICS_DEFAULT_HOURS = 24 * 7
+
+
+def analytics_response(name):
+    """
+    Run an analytics query over the configured stations' recorded predictions.
+
+    Query params:
+        hours: How far back to look (default a week, at most ANALYTICS_MAX_HOURS)
+        stops: Comma-separated stop IDs with direction (e.g. 120N) instead of
+            the configured stations
+
+    Results are reused until new records arrive or the minute changes.
+    """
+    if history is None:
+        return jsonify({'error': 'Arrivals log is disabled; set ARRIVALS_LOG_DIR to record history'}), 503
+
+    hours = request.args.get('hours', ANALYTICS_DEFAULT_HOURS, type=float)
+    if not 0 < hours <= settings.ANALYTICS_MAX_HOURS:
+        return jsonify({'error': f"hours must be between 0 and {settings.ANALYTICS_MAX_HOURS}"}), 400
+
+    stops = request.args.get('stops')
+    if stops:
+        stop_ids = tuple(sorted(filter(None, stops.split(','))))
+    else:
+        stop_ids = tuple(sorted(
+            station['id'] + direction
+            for station in load_station_config()['stations']
+            for direction in (('N', 'S') if station['direction'] == 'all' else (station['direction'],))
+        ))
+
+    minute = int(time.time() // 60)
+    since = minute * 60 - hours * 3600
+    with timing.phase('load'):
+        history.refresh()
+
+    key = (name, hours, stop_ids)
+    with _analytics_lock:
+        cached = _analytics.get(key)
+        if cached and cached[0] == history.version and cached[1] == minute:
+            return jsonify(cached[2])
+
+    with timing.phase('compute'):
+        columns = history.window(since, stop_ids)
+        result = {
+            'since': int(since),
+            'predictions': len(columns['stop']),
+            name: analytics.QUERIES[name](columns, history.names),
+        }
+
+    with _analytics_lock:
+        # Only the latest minute is ever reused, so drop everything older
+        for stale_key in [k for k, v in _analytics.items() if v[1] != minute]:
+            del _analytics[stale_key]
+        _analytics[key] = (history.version, minute, result)
+
+    return jsonify(result)
+
+
+@app.route('/api/analytics/headways', methods=['GET'])
+def get_headways():
+    """Headways per stop and route ("trains every ~N min")."""
+    return analytics_response('headways')
+
+
+@app.route('/api/analytics/drift', methods=['GET'])
+def get_drift():
+    """Prediction error per route by lead time."""
+    return analytics_response('drift')
+
+
+@app.route('/api/analytics/gaps', methods=['GET'])
+def get_gaps():
+    """Recent service gaps at the configured stations."""
+    return analytics_response('gaps')
 
 
 # --- Legacy API for backward compatibility ---
@@ -300,6 +603,15 @@ def get_data():
     return jsonify(client.get_current_page())
 
 
+# --- Metrics ---
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Fetch, parse and cache metrics for this worker in Prometheus text format."""
+    client.update_age_metrics()
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # --- Static File Serving ---
 
 @app.route('/')
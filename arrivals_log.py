@@ -0,0 +1,272 @@
+"""
+Append-only on-disk history of the arrival predictions seen at watched stops.
+
+Every time a feed is parsed, the client hands the new stop index to an
+ArrivalsRecorder. A writer thread appends one record per prediction
+(stop, route, trip, predicted arrival, feed timestamp) to the current log
+file. Handing off is a non-blocking put on a bounded queue, so neither
+memory nor request latency depends on the disk: if the writer falls
+behind, whole snapshots are dropped and counted.
+
+Log files are self-contained sequences of tagged records:
+
+    header      4s H     MAGIC, format version
+    string      B H      TAG_STRING, byte length, then the UTF-8 bytes;
+                         strings are numbered 0, 1, 2... in order of appearance
+    prediction  B I I I I I
+                         TAG_PREDICTION, feed timestamp, predicted epoch,
+                         stop string, route string, trip string
+
+Stop, route and trip IDs are written once per file and referenced by
+number afterwards. Files rotate at a size limit, and only the newest are
+kept. A record cut short by a crash is ignored on read.
+
+Usage:
+    python arrivals_log.py arrivals_log/ > arrivals.csv    # Dump every log as CSV
+"""
+import csv
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import metrics
+
+MAGIC = b'SUBA'
+VERSION = 1
+
+HEADER = struct.Struct('<4sH')
+STRING = struct.Struct('<BH')
+PREDICTION = struct.Struct('<BIIIII')
+TAG_STRING = 1
+TAG_PREDICTION = 2
+
+QUEUE_SIZE = 64  # Feed snapshots waiting for the writer before new ones are dropped
+
+LOG_RECORDS = metrics.counter('subway_arrivals_log_records_total', 'Predictions appended to the arrivals log')
+LOG_DROPPED = metrics.counter(
+    'subway_arrivals_log_dropped_total', 'Feed snapshots not logged because the writer was behind'
+)
+
+
+class _LogFile:
+    """One open log file and the strings already defined in it."""
+
+    def __init__(self, path):
+        """
+        Raises:
+            FileExistsError: If path already exists (a header must only start a file)
+        """
+        self.path = path
+        self.file = open(path, 'xb')
+        self.strings = {}
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.size = HEADER.size
+
+    def string_id(self, value, chunks):
+        """Return a string's number in this file, queueing its definition on first use."""
+        number = self.strings.get(value)
+        if number is None:
+            number = self.strings[value] = len(self.strings)
+            encoded = value.encode('utf-8')
+            chunks.append(STRING.pack(TAG_STRING, len(encoded)) + encoded)
+        return number
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrivalsRecorder:
+    """Batched, size-rotated writer for the arrivals log."""
+
+    def __init__(self, directory, max_bytes, keep):
+        """
+        Args:
+            directory: Where log files are written (created if missing)
+            max_bytes: Size at which the current file is closed and a new one started
+            keep: Number of log files kept, oldest deleted first
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._log = None
+        self._files_opened = 0
+
+    def record(self, feed_timestamp, index, stop_ids):
+        """
+        Queue a freshly built stop index for logging; never blocks.
+
+        Args:
+            feed_timestamp: Header timestamp of the feed the index came from
+            index: Stop index ({stop_id: [(arrival_time, route_id, trip_id), ...]});
+                must not be modified afterwards
+            stop_ids: Stops to log (the watched stops)
+
+        Returns:
+            True if queued, False if the writer is behind and it was dropped
+        """
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((feed_timestamp or 0, index, frozenset(stop_ids)))
+        except queue.Full:
+            LOG_DROPPED.inc()
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is on disk (for shutdown and tests)."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        done.wait(timeout)
+
+    def _ensure_writer(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="arrivals-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                # Drain whatever else is waiting and write it as one batch
+                batch = [item]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Error writing arrivals log: {e}")
+
+    def _write_batch(self, batch):
+        markers = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                markers.append(item)
+                continue
+
+            feed_timestamp, index, stop_ids = item
+            log = self._current_log()
+            chunks = []
+            records = 0
+            for stop_id in sorted(stop_ids):
+                for arrival_time, route_id, trip_id in index.get(stop_id, ()):
+                    chunks.append(PREDICTION.pack(
+                        TAG_PREDICTION, feed_timestamp, int(arrival_time),
+                        log.string_id(stop_id, chunks), log.string_id(route_id, chunks),
+                        log.string_id(trip_id, chunks)
+                    ))
+                    records += 1
+            log.write(b''.join(chunks))
+            LOG_RECORDS.inc(records)
+
+        if self._log is not None:
+            self._log.file.flush()
+        for marker in markers:
+            marker.set()
+
+    def _current_log(self):
+        """Return the open log file, rotating to a new one at max_bytes."""
+        if self._log is not None and self._log.size < self.max_bytes:
+            return self._log
+
+        if self._log is not None:
+            self._log.close()
+        self._log = None
+        os.makedirs(self.directory, exist_ok=True)
+        while self._log is None:
+            # Another recorder can pick the same name; take the next number then
+            self._files_opened += 1
+            name = f"arrivals-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._files_opened}.bin"
+            try:
+                self._log = _LogFile(os.path.join(self.directory, name))
+            except FileExistsError:
+                pass
+        self._prune()
+        return self._log
+
+    def _prune(self):
+        for path in log_files(self.directory)[:-self.keep]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def log_files(directory):
+    """Log files in a directory, oldest first."""
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith('arrivals-') and name.endswith('.bin')]
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def read_log(path):
+    """
+    Yield the predictions in one log file.
+
+    Yields:
+        Tuples of (stop_id, route_id, trip_id, predicted epoch, feed timestamp)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        return
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} arrivals log")
+
+    strings = []
+    offset = HEADER.size
+    while offset < len(data):
+        tag = data[offset]
+        if tag == TAG_STRING:
+            if offset + STRING.size > len(data):
+                return
+            _, length = STRING.unpack_from(data, offset)
+            start = offset + STRING.size
+            if start + length > len(data):
+                return
+            strings.append(data[start:start + length].decode('utf-8'))
+            offset = start + length
+        elif tag == TAG_PREDICTION:
+            if offset + PREDICTION.size > len(data):
+                return
+            _, feed_timestamp, predicted, stop, route, trip = PREDICTION.unpack_from(data, offset)
+            yield strings[stop], strings[route], strings[trip], predicted, feed_timestamp
+            offset += PREDICTION.size
+        else:
+            raise ValueError(f"{path}: unknown record tag {tag} at byte {offset}")
+
+
+def read_logs(directory):
+    """Yield the predictions of every log file in a directory, oldest file first."""
+    for path in log_files(directory):
+        yield from read_log(path)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python arrivals_log.py LOG_DIR > arrivals.csv")
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['stop_id', 'route_id', 'trip_id', 'predicted', 'feed_timestamp'])
+    writer.writerows(read_logs(sys.argv[1]))
+
+
+if __name__ == "__main__":
+    main()
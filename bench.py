@@ -0,0 +1,282 @@
+"""
+Offline microbenchmarks for feed handling and the web API's hot paths.
+
+Runs entirely against synthetic feeds from feed_fixtures (or captured ones
+via --fixtures) and prints one JSON document, so runs on a laptop and on a
+Pi can be saved and compared before a rollout.
+
+Usage:
+    python bench.py                          # Generated fixtures, JSON to stdout
+    python bench.py --fixtures fixtures/     # Use <group>.pb / alerts.pb files
+    python bench.py --output before.json --iterations 100
+    python bench.py --fonts ../rpi-rgb-led-matrix/fonts   # Include LED frame rendering
+"""
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+import google.protobuf
+from google.protobuf.internal import api_implementation
+from google.transit import gtfs_realtime_pb2
+import config
+import feed_fixtures
+import led_canvas
+import led_renderer
+from mta_client import FEED_URLS, build_stop_index, build_watched_stop_index, compile_stop_pattern
+
+SEARCH_QUERIES = ["", "1", "14", "av", "times sq", "jay st", "a42", "xyz"]
+
+
+def measure(fn, iterations, setup=None, warmup=3):
+    """
+    Time fn over a number of iterations.
+
+    Args:
+        fn: Callable to time
+        iterations: Timed calls
+        setup: Optional callable run (untimed) before every call
+        warmup: Untimed calls made first
+
+    Returns:
+        Dict of timing statistics in microseconds
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': round(statistics.fmean(samples), 2),
+        'median_us': round(statistics.median(samples), 2),
+        'min_us': round(samples[0], 2),
+        'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'max_us': round(samples[-1], 2),
+        'stdev_us': round(statistics.stdev(samples), 2) if len(samples) > 1 else 0.0,
+    }
+
+
+def make_board(groups):
+    """A board with one "all"-direction station per feed plus a northbound-only one."""
+    stations = []
+    for group in groups:
+        stops = feed_fixtures.stops_for_feed(group)
+        stop = stops[len(stops) // 2]
+        stations.append({'id': stop, 'direction': 'all', 'name': stop, 'uuid': f"{stop}_all"})
+    first = stations[0]['id']
+    stations.append({'id': first, 'direction': 'N', 'name': first, 'uuid': f"{first}_N"})
+    return {'stations': stations}
+
+
+def run(fixtures, iterations):
+    """Run every benchmark and return {name: stats}."""
+    results = {}
+    groups = [group for group in FEED_URLS if group in fixtures]
+    board = make_board(groups)
+    board_stops = {
+        station['id'] + direction
+        for station in board['stations']
+        for direction in ('N', 'S')
+    }
+    stop_pattern = compile_stop_pattern(board_stops)
+
+    # Feed parsing and indexing, per feed group
+    for group in groups:
+        content = fixtures[group]
+        feed = gtfs_realtime_pb2.FeedMessage()
+
+        results[f"parse/{group}"] = measure(lambda: feed.ParseFromString(content), iterations)
+        results[f"index_full/{group}"] = measure(lambda: build_stop_index(feed), iterations)
+        results[f"index_selective/{group}"] = measure(
+            lambda: build_watched_stop_index(content, board_stops, stop_pattern), iterations
+        )
+
+    # The web app's client, loaded from the fixtures instead of the network
+    config.BACKGROUND_REFRESH = False
+    import app
+
+    client = app.client
+    client.watch_stations(board['stations'])
+    for group in groups:
+        client.load_feed(FEED_URLS[group], fixtures[group])
+
+    def keep_feeds_fresh():
+        # Stay offline however long the run takes: no feed ever ages past DATA_REFRESH_RATE
+        now = time.time()
+        for entry in client.feed_cache.values():
+            entry['last_fetch'] = now
+        return now
+
+    def cold_station_cache():
+        # Keep feeds fresh so nothing is refetched, but recompute every station
+        keep_feeds_fresh()
+        client.station_cache.clear()
+
+    def warm_station_cache():
+        # Keep feeds and computed stations fresh so every lookup is a cache hit
+        now = keep_feeds_fresh()
+        for entry in client.station_cache.values():
+            entry['last_fetch'] = now
+
+    lookups = [
+        (station['id'], direction)
+        for station in board['stations']
+        for direction in (('N', 'S') if station['direction'] == 'all' else (station['direction'],))
+    ]
+
+    def extract_stations():
+        for station_id, direction in lookups:
+            client.fetch_arrivals_for_station(station_id, direction)
+
+    results['station_extraction'] = measure(extract_stations, iterations, setup=cold_station_cache)
+    results['arrivals_merge'] = measure(lambda: app.build_arrivals(board), iterations, setup=cold_station_cache)
+    results['arrivals_merge_cached'] = measure(lambda: app.build_arrivals(board), iterations, setup=warm_station_cache)
+
+    # Alerts
+    if 'alerts' in fixtures:
+        alerts_content = fixtures['alerts']
+
+        def reset_alerts():
+            client.alerts_hash = None
+            client._processed_alerts = {}
+
+        def changed_alerts():
+            client.alerts_hash = None
+
+        def fresh_alerts():
+            client.alerts_last_fetch = time.time()
+
+        results['alerts_load'] = measure(lambda: client.load_alerts(alerts_content), iterations, setup=reset_alerts)
+        results['alerts_load_incremental'] = measure(
+            lambda: client.load_alerts(alerts_content), iterations, setup=changed_alerts
+        )
+        results['alerts_filter'] = measure(lambda: app.build_alerts(board), iterations, setup=fresh_alerts)
+
+    # Station search, on the index and through the endpoint
+    def search_all():
+        for query in SEARCH_QUERIES:
+            app.station_index.search(query, limit=50)
+
+    http = app.app.test_client()
+
+    def search_endpoint():
+        for query in SEARCH_QUERIES:
+            http.get('/api/stations/available', query_string={'q': query})
+
+    results['station_search'] = measure(search_all, iterations)
+    results['station_search_endpoint'] = measure(search_endpoint, iterations)
+
+    return results
+
+
+def run_led(iterations, font_dir):
+    """Time drawing the LED page on the headless canvas; {} if the BDF fonts can't be loaded."""
+    try:
+        assets = led_renderer.RenderAssets(led_canvas.graphics, font_dir)
+    except OSError as e:
+        print(f"Skipping LED benchmarks: {e}", file=sys.stderr)
+        return {}
+
+    now = time.time()
+    page = led_renderer.build_page([(now + 45 + 150 * i, line) for i, line in enumerate(['1', '4', '7', 'A', '2', 'GS'])], now)
+
+    matrix = led_canvas.HeadlessMatrix()
+    state = {'canvas': matrix.CreateFrameCanvas()}
+
+    def draw_frame():
+        canvas = state['canvas']
+        canvas.Clear()
+        led_renderer.draw_page(canvas, assets, page)
+        state['canvas'] = matrix.SwapOnVSync(canvas)
+
+    renderer = led_renderer.FrameRenderer(font_dir)
+    frame = renderer.render(page)
+    canvas = led_canvas.Canvas()
+
+    results = {
+        'led_assets_load': measure(lambda: led_renderer.RenderAssets(led_canvas.graphics, font_dir), iterations),
+        'led_frame': measure(draw_frame, iterations),
+        'led_frame_render': measure(lambda: renderer.render(page), iterations),
+        'led_frame_blit': measure(lambda: led_renderer.blit(canvas, frame), iterations),
+    }
+    results['led_frame']['draw_calls'] = sum(matrix.last_frame['calls'].values())
+    results['led_frame']['pixel_writes'] = matrix.last_frame['pixel_writes']
+    return results
+
+
+def describe_fixtures(fixtures):
+    """Size and entity count of each fixture."""
+    described = {}
+    for name, content in fixtures.items():
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.ParseFromString(content)
+        described[name] = {'bytes': len(content), 'entities': len(feed.entity)}
+    return described
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the subway display")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed runs per benchmark")
+    parser.add_argument('--fixtures', help="Directory of <group>.pb / alerts.pb files to use instead of generated feeds")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplier on generated trips per feed")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for generated feeds")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--fonts', help="BDF font directory; adds LED frame benchmarks on the headless canvas")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = feed_fixtures.load_fixtures(args.fixtures)
+        if not fixtures:
+            parser.error(f"No fixtures found in {args.fixtures}")
+    else:
+        fixtures = feed_fixtures.make_fixtures(scale=args.scale, seed=args.seed)
+
+    # Anything the app prints goes to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(fixtures, args.iterations)
+        if args.fonts:
+            results.update(run_led(args.iterations, args.fonts))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'protobuf': google.protobuf.__version__,
+            'protobuf_backend': api_implementation.Type(),
+            'selective_decode': config.SELECTIVE_DECODE,
+            'iterations': args.iterations,
+            'fixtures': args.fixtures or 'generated',
+            'scale': args.scale,
+            'seed': args.seed,
+            'fonts': args.fonts,
+        },
+        'fixtures': describe_fixtures(fixtures),
+        'results': results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
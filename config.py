@@ -1,9 +1,53 @@
+import os
+
 # MTA Configuration
-FEED_URL = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs"
+# Point MTA_API_BASE at a local mock_mta.py server (e.g. http://localhost:8001) for offline/load testing
+MTA_API_BASE = os.environ.get("MTA_API_BASE", "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds")
+FEED_URL = MTA_API_BASE + "/nyct%2Fgtfs"
 TARGET_STATION_ID = "120"  # 96 St (1/2/3 Lines)
 DIRECTION = "N"            # N = Northbound (Uptown)
+FEED_TIMEOUT = 10          # Seconds to wait on a single MTA feed before giving up
+MAX_CONCURRENT_FEEDS = 4   # Feeds fetched in parallel when a board spans several lines
+SELECTIVE_DECODE = True    # Only decode trip updates that touch a configured stop
+BACKGROUND_REFRESH = True  # Web app keeps watched feeds warm in a background thread
+STREAM_MAX_CLIENTS = 24    # Open /api/stream connections per web worker (keep below gunicorn --threads)
+
+# Shared feed cache: one elected process fetches, other web workers read its snapshots
+SHARED_CACHE_PATH = "/tmp/subway_feed_cache.db"  # Set to None to disable
+SHARED_CACHE_POLL = 1      # Seconds between checks for newer shared snapshots
+
+# Background refresh: each feed is polled just after its next expected update,
+# learned from the header timestamps it publishes (see mta_client.FeedSchedule)
+REFRESH_MIN = 2            # Never poll a feed more often than this; also the first retry when an update is late
+REFRESH_MAX = 120          # Longest cadence a feed is assumed to have
+REFRESH_BACKOFF_MAX = 600  # Longest wait between retries of a failing feed
+VIEWER_IDLE = 600          # Stop polling feeds nobody has asked for in this long (configured stations' feeds always poll)
+
+# Stop -> routes -> feed index compiled from the static GTFS by gtfs_static.py;
+# without it, feeds and lines are guessed from the station ID prefix
+STOP_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stop_index.bin")
+
+# Last good feed bodies, kept on disk so a restart shows (stale) arrivals at once
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")  # Set to None to disable
+SNAPSHOT_INTERVAL = 300    # Minimum seconds between saves of each feed
+
+# History of every prediction at the watched stops, appended off the request path
+ARRIVALS_LOG_DIR = None    # e.g. os.path.join(os.path.dirname(os.path.abspath(__file__)), "arrivals_log")
+ARRIVALS_LOG_MAX_BYTES = 16 * 1024 * 1024  # Rotate to a new file at this size
+ARRIVALS_LOG_KEEP = 30     # Log files kept, oldest deleted first
+ANALYTICS_MAX_HOURS = 24 * 28  # Longest history the /api/analytics endpoints will look back over
+ANALYTICS_REFRESH = 60     # Seconds between checks of the log for new records
+
+# Request profiling: save sampled stacks of web requests slower than this many ms (0 disables)
+PROFILE_SLOW_MS = int(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_DIR = "/tmp/subway_profiles"
 
 # Display Settings
 PAGE_DURATION = 5          # Seconds per page
-DATA_REFRESH_RATE = 30     # Seconds before fetching new MTA data
+DATA_REFRESH_RATE = 30     # Seconds before fetching new MTA data (the background refresher's first guess at each feed's cadence)
 BRIGHTNESS = 50            # Percentage (1-100). Recommended 50% to save power.
+
+# Show frames rendered by the web app instead of laying out arrivals on the Pi,
+# e.g. "http://192.168.1.10:5001/api/led/frame?direction=N" (None disables)
+LED_FRAME_URL = os.environ.get("LED_FRAME_URL") or None
+LED_FRAME_POLL = 5         # Seconds between frame requests
@@ -46,7 +46,17 @@ echo "Copying application files..."
 scp app.py \
     config.py \
     mta_client.py \
+    gtfs_static.py \
+    arrivals_log.py \
+    analytics.py \
+    feed_store.py \
+    station_store.py \
+    station_search.py \
+    metrics.py \
+    timing.py \
     main.py \
+    led_canvas.py \
+    led_renderer.py \
     requirements.txt \
     start.sh \
     stations.py \
@@ -55,6 +65,11 @@ scp app.py \
     docker-compose.yml \
     "$PI_HOST:~/$REMOTE_BASE/"
 
+# Copy the compiled stop index (see gtfs_static.py), if one has been built
+if [ -f stop_index.bin ]; then
+    scp stop_index.bin "$PI_HOST:~/$REMOTE_BASE/"
+fi
+
 # Copy the built frontend
 echo "Copying frontend..."
 scp -r frontend/dist "$PI_HOST:~/$REMOTE_BASE/frontend/"
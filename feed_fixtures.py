@@ -0,0 +1,231 @@
+"""
+Synthetic GTFS-realtime feeds shaped like the MTA's.
+
+Generates a trip feed for every FEED_URLS group (trip updates plus vehicle
+positions, using that group's routes and real stop IDs from stations.py)
+and a service alerts feed, so feed handling can be exercised without
+network access or an API key. Output is deterministic for a given seed and
+clock.
+
+Usage:
+    python feed_fixtures.py fixtures/    # Write <group>.pb and alerts.pb
+"""
+import os
+import random
+import sys
+import time
+from google.transit import gtfs_realtime_pb2
+from mta_client import FEED_URLS, get_feeds_for_station
+from stations import STATIONS
+
+# Routes carried by each feed group
+FEED_ROUTES = {
+    "123456S": ["1", "2", "3", "4", "5", "6", "6X", "GS"],
+    "NQRW": ["N", "Q", "R", "W"],
+    "BDFM": ["B", "D", "F", "FX", "M", "FS"],
+    "ACE": ["A", "C", "E", "H"],
+    "JZ": ["J", "Z"],
+    "L": ["L"],
+    "G": ["G"],
+    "7": ["7", "7X"],
+    "SIR": ["SI"],
+}
+
+# Roughly how many trips each feed carries at rush hour
+TRIPS_PER_FEED = {
+    "123456S": 420,
+    "NQRW": 220,
+    "BDFM": 260,
+    "ACE": 240,
+    "JZ": 80,
+    "L": 70,
+    "G": 50,
+    "7": 90,
+    "SIR": 30,
+}
+
+STOPS_PER_TRIP = 25   # Upcoming stops listed per trip update
+ALERT_COUNT = 60      # Alerts in the alerts feed
+
+ALERT_HEADERS = [
+    ("[{route}] trains are running with delays", "We're running trains with delays while we address a signal problem."),
+    ("[{route}] trains are running with major delays", "Expect longer waits while crews respond to a disabled train."),
+    ("No [{route}] service between two stations", "Service is suspended in both directions while we remove debris from the tracks."),
+    ("[{route}] trains are running local", "Trains make all local stops due to planned work."),
+    ("Elevator outage", "The elevator at this station is out of service for maintenance."),
+    ("Some [{route}] trips were canceled", "Expect longer waits between trains."),
+]
+
+
+def stops_for_feed(group):
+    """Return the station IDs from stations.py served by a feed group, in ID order."""
+    feed_url = FEED_URLS[group]
+    stops = sorted(
+        station_id for station_id in STATIONS
+        if feed_url in get_feeds_for_station(station_id)
+    )
+    return stops or [f"{group}{i:02d}" for i in range(1, 41)]
+
+
+def make_trip_feed(group, trips=None, stops_per_trip=STOPS_PER_TRIP, now=None, seed=0, origin=None):
+    """
+    Build a serialized trip feed for a FEED_URLS group.
+
+    Args:
+        group: FEED_URLS key (e.g. "ACE")
+        trips: Number of trips (defaults to TRIPS_PER_FEED[group])
+        stops_per_trip: Upcoming stop time updates per trip
+        now: Feed timestamp; stops already passed by then are left out
+            (defaults to time.time())
+        seed: Random seed; the same seed and clocks give identical bytes
+        origin: Clock the trip schedule is laid out from (defaults to now).
+            Keeping it fixed while now advances makes trains move through
+            successive feeds instead of the feed repeating.
+
+    Returns:
+        FeedMessage bytes
+    """
+    now = int(time.time() if now is None else now)
+    origin = now if origin is None else int(origin)
+    trips = TRIPS_PER_FEED[group] if trips is None else trips
+    rng = random.Random(f"{seed}:{group}")
+    routes = FEED_ROUTES[group]
+    stops = stops_for_feed(group)
+
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "1.0"
+    feed.header.timestamp = now
+
+    for i in range(trips):
+        route = rng.choice(routes)
+        direction = rng.choice("NS")
+        line_stops = stops if direction == "N" else stops[::-1]
+        start = rng.randrange(len(line_stops))
+        origin_time = origin + rng.randint(-1800, 3600)
+        trip_id = f"{(origin_time // 60) % 144000:06d}_{route}..{direction}{i:02d}R"
+
+        trip_entity = feed.entity.add()
+        trip_entity.id = f"{i * 2 + 1:06d}"
+        trip_update = trip_entity.trip_update
+        trip_update.trip.trip_id = trip_id
+        trip_update.trip.route_id = route
+        trip_update.trip.start_date = time.strftime("%Y%m%d", time.localtime(now))
+
+        arrival = origin_time
+        next_stop = None
+        for stop_id in line_stops[start:start + stops_per_trip]:
+            arrival += rng.randint(60, 150)
+            dwell = rng.randint(0, 30)
+            # Like the real feeds, stops the train has passed are dropped
+            if arrival < now - 30:
+                continue
+            update = trip_update.stop_time_update.add()
+            update.stop_id = stop_id + direction
+            update.arrival.time = arrival
+            update.departure.time = arrival + dwell
+            if next_stop is None:
+                next_stop = update.stop_id
+
+        vehicle_entity = feed.entity.add()
+        vehicle_entity.id = f"{i * 2 + 2:06d}"
+        vehicle = vehicle_entity.vehicle
+        vehicle.trip.trip_id = trip_id
+        vehicle.trip.route_id = route
+        vehicle.timestamp = now - rng.randint(0, 60)
+        if next_stop:
+            vehicle.stop_id = next_stop
+            vehicle.current_status = gtfs_realtime_pb2.VehiclePosition.INCOMING_AT
+
+    return feed.SerializeToString()
+
+
+def make_alerts_feed(alerts=ALERT_COUNT, now=None, seed=0):
+    """
+    Build a serialized service alerts feed.
+
+    Args:
+        alerts: Number of alert entities
+        now: Clock the active periods are relative to (defaults to time.time())
+        seed: Random seed; the same seed and clock give identical bytes
+
+    Returns:
+        FeedMessage bytes
+    """
+    now = int(time.time() if now is None else now)
+    rng = random.Random(f"{seed}:alerts")
+    all_routes = [route for routes in FEED_ROUTES.values() for route in routes]
+
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "1.0"
+    feed.header.timestamp = now
+
+    for i in range(alerts):
+        routes = rng.sample(all_routes, rng.randint(1, 3))
+        header, description = rng.choice(ALERT_HEADERS)
+
+        entity = feed.entity.add()
+        entity.id = f"lmm:alert:{100000 + i}"
+        alert = entity.alert
+
+        for route in routes:
+            informed = alert.informed_entity.add()
+            informed.agency_id = "MTASBWY"
+            informed.route_id = route
+
+        period = alert.active_period.add()
+        period.start = now - rng.randint(0, 7200)
+        period.end = now + rng.randint(600, 86400)
+
+        for language, text in (("en", header.format(route=routes[0])),
+                               ("en-html", f"<p>{header.format(route=routes[0])}</p>")):
+            translation = alert.header_text.translation.add()
+            translation.language = language
+            translation.text = text
+        for language, text in (("en", description), ("en-html", f"<p>{description}</p>")):
+            translation = alert.description_text.translation.add()
+            translation.language = language
+            translation.text = text
+
+    return feed.SerializeToString()
+
+
+def make_fixtures(scale=1.0, now=None, seed=0):
+    """
+    Build every feed at once.
+
+    Args:
+        scale: Multiplier applied to each feed's trip count
+        now: Clock shared by all feeds (defaults to time.time())
+        seed: Random seed
+
+    Returns:
+        Dict mapping FEED_URLS group (and "alerts") to FeedMessage bytes
+    """
+    now = int(time.time() if now is None else now)
+    fixtures = {
+        group: make_trip_feed(group, trips=max(1, int(TRIPS_PER_FEED[group] * scale)), now=now, seed=seed)
+        for group in FEED_URLS
+    }
+    fixtures["alerts"] = make_alerts_feed(now=now, seed=seed)
+    return fixtures
+
+
+def load_fixtures(directory):
+    """Load <group>.pb and alerts.pb files written by this module (or captured from the MTA)."""
+    fixtures = {}
+    for group in list(FEED_URLS) + ["alerts"]:
+        path = os.path.join(directory, f"{group}.pb")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                fixtures[group] = f.read()
+    return fixtures
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "fixtures"
+    os.makedirs(directory, exist_ok=True)
+    for name, content in make_fixtures().items():
+        path = os.path.join(directory, f"{name}.pb")
+        with open(path, "wb") as f:
+            f.write(content)
+        print(f"Wrote {path} ({len(content)} bytes)")
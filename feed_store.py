@@ -0,0 +1,125 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+
+
+class SharedFeedStore:
+    """
+    Feed snapshots shared between processes through a local SQLite (WAL) file.
+
+    One process at a time holds an exclusive lock on a sidecar lock file and
+    is the elected fetcher: it talks to the MTA and publishes every new feed
+    index and alerts list here. All other processes (e.g. the other gunicorn
+    workers) read those snapshots instead of fetching themselves, and register
+    the feeds they need so the fetcher keeps them warm. If the fetcher exits,
+    the OS drops its lock and the next process to try takes over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.is_leader = False
+        self._lock_file = None
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                timestamp INTEGER,
+                hash BLOB,
+                last_fetch REAL,
+                updated_at REAL,
+                payload TEXT
+            )"""
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watched (url TEXT PRIMARY KEY, requested_at REAL)"
+        )
+        self._db.commit()
+
+    def try_lead(self):
+        """Try to become the elected fetcher. Returns True while this process holds the role."""
+        if self.is_leader:
+            return True
+
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+
+        self.is_leader = True
+        print(f"Process {os.getpid()} is now the shared feed fetcher")
+        return True
+
+    def publish(self, url, entry, payload):
+        """
+        Publish a new snapshot for a feed (or the alerts feed).
+
+        Args:
+            url: Feed URL the snapshot belongs to
+            entry: Dict with timestamp, hash, last_fetch and updated_at
+            payload: JSON-serializable snapshot (stop index or alerts list)
+        """
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    entry.get('timestamp'),
+                    entry.get('hash'),
+                    entry['last_fetch'],
+                    entry['updated_at'],
+                    json.dumps(payload, separators=(',', ':')),
+                ),
+            )
+            self._db.commit()
+
+    def updated_since(self, versions):
+        """
+        Load snapshots published after the versions a reader already has.
+
+        Args:
+            versions: Dict mapping url to the updated_at the caller holds
+
+        Returns:
+            Dict mapping url to {timestamp, hash, last_fetch, updated_at, payload}
+        """
+        with self._db_lock:
+            rows = self._db.execute("SELECT url, updated_at FROM feeds").fetchall()
+            changed = [url for url, updated_at in rows if updated_at > versions.get(url, 0)]
+
+            snapshots = {}
+            for url in changed:
+                timestamp, content_hash, last_fetch, updated_at, payload = self._db.execute(
+                    "SELECT timestamp, hash, last_fetch, updated_at, payload FROM feeds WHERE url = ?",
+                    (url,),
+                ).fetchone()
+                snapshots[url] = {
+                    'timestamp': timestamp,
+                    'hash': content_hash,
+                    'last_fetch': last_fetch,
+                    'updated_at': updated_at,
+                    'payload': json.loads(payload),
+                }
+
+        return snapshots
+
+    def request_feeds(self, urls, requested_at):
+        """Register feeds this process needs so the elected fetcher keeps them warm."""
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO watched VALUES (?, ?)",
+                [(url, requested_at) for url in urls],
+            )
+            self._db.commit()
+
+    def requested_feeds(self):
+        """Return {url: requested_at} for every feed any process has asked the fetcher to keep warm."""
+        with self._db_lock:
+            rows = self._db.execute("SELECT url, requested_at FROM watched").fetchall()
+        return dict(rows)
@@ -86,13 +86,43 @@ function App() {
     }
   }, [arrivals, ledSelectedStations.length])
 
-  // Poll for arrivals every 10 seconds
+  // Live updates: the server pushes arrivals/alerts only when they change.
+  // Fall back to polling every 10 seconds where EventSource isn't available.
   useEffect(() => {
-    const interval = setInterval(() => {
-      fetchArrivals()
-      fetchAlerts()
-    }, 10000)
-    return () => clearInterval(interval)
+    if (!window.EventSource) {
+      const interval = setInterval(() => {
+        fetchArrivals()
+        fetchAlerts()
+      }, 10000)
+      return () => clearInterval(interval)
+    }
+
+    // EventSource reconnects on its own if the connection drops, but gives
+    // up on an error response (e.g. 503 when the server is at its stream
+    // limit): poll instead from then on
+    let interval = null
+    const source = new EventSource('/api/stream')
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !interval) {
+        interval = setInterval(() => {
+          fetchArrivals()
+          fetchAlerts()
+        }, 10000)
+      }
+    }
+    source.addEventListener('arrivals', (e) => {
+      setArrivals(JSON.parse(e.data))
+      setLastUpdated(new Date())
+      setError(null)
+      setLoading(false)
+    })
+    source.addEventListener('alerts', (e) => {
+      setAlerts(JSON.parse(e.data))
+    })
+    return () => {
+      source.close()
+      if (interval) clearInterval(interval)
+    }
   }, [fetchArrivals, fetchAlerts])
 
   // Add a new station
@@ -522,6 +552,8 @@ function App() {
         isOpen={isLedViewOpen}
         onClose={() => setIsLedViewOpen(false)}
         selectedStationIds={ledSelectedStations}
+        stationArrivals={arrivals}
+        loading={loading}
       />
     </div>
   )
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useRef } from 'react'
 
 // Line colors matching the physical LED display
 const LINE_COLORS = {
@@ -16,45 +16,44 @@ const LINE_COLORS = {
 const AMBER = '#FFB81C'
 const GREY = '#646464'
 
-function LedMatrixView({ isOpen, onClose, selectedStationIds = [] }) {
+// Raw RGB frames from /api/led/frame, pixel-for-pixel what the Pi shows
+const FRAME_WIDTH = 64
+const FRAME_HEIGHT = 32
+
+function LedMatrixView({ isOpen, onClose, selectedStationIds = [], stationArrivals = [], loading = false }) {
   const [arrivals, setArrivals] = useState([])
   const [allArrivals, setAllArrivals] = useState([])
-  const [loading, setLoading] = useState(true)
   const [directionFilter, setDirectionFilter] = useState('all') // 'all', 'N', 'S'
+  const [frame, setFrame] = useState(null) // Server-rendered frame; null falls back to the HTML layout
+  const canvasRef = useRef(null)
+  const stationsParam = selectedStationIds.join(',')
 
-  const fetchData = useCallback(async () => {
-    try {
-      // Fetch from arrivals endpoint to get direction info
-      const res = await fetch('/api/arrivals')
-      const data = await res.json()
+  // Arrivals come from the dashboard's live stream rather than a separate poll
+  useEffect(() => {
+    if (!Array.isArray(stationArrivals)) return
 
-      // Filter by selected stations if provided
-      // If selectedStationIds is empty array, show nothing (or handled by empty filteredData)
-      const filteredData = selectedStationIds.length > 0
-        ? data.filter(s => selectedStationIds.includes(s.uuid))
-        : []
+    // Filter by selected stations if provided
+    // If selectedStationIds is empty array, show nothing (or handled by empty filteredData)
+    const filteredData = selectedStationIds.length > 0
+      ? stationArrivals.filter(s => selectedStationIds.includes(s.uuid))
+      : []
 
-      // Flatten all arrivals with their direction
-      const flattened = []
-      filteredData.forEach(station => {
-        station.arrivals.forEach(arrival => {
-          flattened.push({
-            ...arrival,
-            direction: station.direction,
-            stationName: station.name
-          })
+    // Flatten all arrivals with their direction
+    const flattened = []
+    filteredData.forEach(station => {
+      station.arrivals.forEach(arrival => {
+        flattened.push({
+          ...arrival,
+          direction: station.direction,
+          stationName: station.name
         })
       })
+    })
 
-      // Sort by time
-      flattened.sort((a, b) => a.time - b.time)
-      setAllArrivals(flattened)
-    } catch (err) {
-      console.error('Failed to fetch LED data:', err)
-    } finally {
-      setLoading(false)
-    }
-  }, [selectedStationIds])
+    // Sort by time
+    flattened.sort((a, b) => a.time - b.time)
+    setAllArrivals(flattened)
+  }, [stationArrivals, selectedStationIds])
 
   // Filter arrivals based on direction
   useEffect(() => {
@@ -67,13 +66,44 @@ function LedMatrixView({ isOpen, onClose, selectedStationIds = [] }) {
     setArrivals(ranked)
   }, [allArrivals, directionFilter])
 
+  // Fetch the rendered frame whenever the arrivals or the selection change;
+  // an unchanged frame is revalidated with its ETag and costs a 304
+  useEffect(() => {
+    if (!isOpen) return
+
+    const controller = new AbortController()
+    const params = new URLSearchParams({ stations: stationsParam, direction: directionFilter })
+    fetch(`/api/led/frame?${params}`, { signal: controller.signal })
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`)
+        return response.arrayBuffer()
+      })
+      .then(buffer => {
+        setFrame(buffer.byteLength === FRAME_WIDTH * FRAME_HEIGHT * 3 ? new Uint8Array(buffer) : null)
+      })
+      .catch(err => {
+        // e.g. the server has no LED fonts: keep drawing the layout here
+        if (err.name !== 'AbortError') setFrame(null)
+      })
+
+    return () => controller.abort()
+  }, [isOpen, stationArrivals, stationsParam, directionFilter])
+
+  // Paint the frame onto the 64x32 canvas
   useEffect(() => {
-    if (isOpen) {
-      fetchData()
-      const interval = setInterval(fetchData, 10000)
-      return () => clearInterval(interval)
+    const canvas = canvasRef.current
+    if (!frame || !canvas) return
+
+    const context = canvas.getContext('2d')
+    const image = context.createImageData(FRAME_WIDTH, FRAME_HEIGHT)
+    for (let i = 0, j = 0; i < frame.length; i += 3, j += 4) {
+      image.data[j] = frame[i]
+      image.data[j + 1] = frame[i + 1]
+      image.data[j + 2] = frame[i + 2]
+      image.data[j + 3] = 255
     }
-  }, [isOpen, fetchData])
+    context.putImageData(image, 0, 0)
+  }, [frame, loading])
 
   // Handle ESC key
   useEffect(() => {
@@ -148,6 +178,17 @@ function LedMatrixView({ isOpen, onClose, selectedStationIds = [] }) {
                 imageRendering: 'pixelated',
               }}
             >
+              {/* Server-rendered frame, scaled up without smoothing */}
+              {frame && !loading && (
+                <canvas
+                  ref={canvasRef}
+                  width={FRAME_WIDTH}
+                  height={FRAME_HEIGHT}
+                  className="absolute inset-0 w-full h-full"
+                  style={{ imageRendering: 'pixelated' }}
+                />
+              )}
+
               {/* Pixel grid overlay */}
               <div
                 className="absolute inset-0 pointer-events-none"
@@ -160,155 +201,157 @@ function LedMatrixView({ isOpen, onClose, selectedStationIds = [] }) {
                 }}
               />
 
-              {/* Content container */}
-              <div className="absolute inset-0 flex font-mono">
-                {/* LEFT SIDE - Top 2 trains (large) */}
-                <div className="flex-1 flex flex-col justify-start" style={{ padding: '2%' }}>
-                  {loading ? (
-                    <div className="text-red-500 text-lg">Loading...</div>
-                  ) : topTrains.length === 0 ? (
-                    <div
-                      className="font-bold"
-                      style={{
-                        color: '#FF0000',
-                        fontSize: 'min(5vw, 32px)',
-                        textShadow: '0 0 8px #FF0000',
-                        marginTop: '25%',
-                      }}
-                    >
-                      NO TRAINS
-                    </div>
-                  ) : (
-                    topTrains.map((train, i) => (
+              {/* Content container (when no frame is available) */}
+              {!(frame && !loading) && (
+                <div className="absolute inset-0 flex font-mono">
+                  {/* LEFT SIDE - Top 2 trains (large) */}
+                  <div className="flex-1 flex flex-col justify-start" style={{ padding: '2%' }}>
+                    {loading ? (
+                      <div className="text-red-500 text-lg">Loading...</div>
+                    ) : topTrains.length === 0 ? (
                       <div
-                        key={i}
-                        className="flex items-center"
+                        className="font-bold"
                         style={{
-                          height: '50%',
-                          gap: '3%',
+                          color: '#FF0000',
+                          fontSize: 'min(5vw, 32px)',
+                          textShadow: '0 0 8px #FF0000',
+                          marginTop: '25%',
                         }}
+                      >
+                        NO TRAINS
+                      </div>
+                    ) : (
+                      topTrains.map((train, i) => (
+                        <div
+                          key={i}
+                          className="flex items-center"
+                          style={{
+                            height: '50%',
+                            gap: '3%',
+                          }}
+                        >
+                          {/* Rank */}
+                          <span
+                            className="font-bold"
+                            style={{
+                              color: GREY,
+                              fontSize: 'min(4vw, 24px)',
+                              minWidth: '10%',
+                            }}
+                          >
+                            {train.rank}.
+                          </span>
+
+                          {/* Line bullet */}
+                          <div
+                            className="rounded-full flex items-center justify-center font-bold flex-shrink-0"
+                            style={{
+                              width: 'min(8vw, 52px)',
+                              height: 'min(8vw, 52px)',
+                              backgroundColor: LINE_COLORS[train.line] || '#666',
+                              color: ['N', 'Q', 'R', 'W'].includes(train.line) ? '#000' : '#fff',
+                              fontSize: 'min(4vw, 24px)',
+                              boxShadow: `0 0 10px ${LINE_COLORS[train.line] || '#666'}`,
+                            }}
+                          >
+                            {train.line}
+                          </div>
+
+                          {/* Time */}
+                          <div className="flex items-baseline">
+                            <span
+                              className="font-bold"
+                              style={{
+                                color: AMBER,
+                                fontSize: 'min(5vw, 32px)',
+                                textShadow: `0 0 8px ${AMBER}`,
+                              }}
+                            >
+                              {train.time}
+                            </span>
+                            <span
+                              style={{
+                                color: AMBER,
+                                fontSize: 'min(2.5vw, 16px)',
+                                marginLeft: '4px',
+                                textShadow: `0 0 6px ${AMBER}`,
+                              }}
+                            >
+                              mins
+                            </span>
+                          </div>
+                        </div>
+                      ))
+                    )}
+                  </div>
+
+                  {/* Divider line */}
+                  <div
+                    className="self-stretch"
+                    style={{
+                      width: '1px',
+                      backgroundColor: '#333',
+                      margin: '2% 0',
+                    }}
+                  />
+
+                  {/* RIGHT SIDE - List of next trains */}
+                  <div
+                    className="flex flex-col justify-around"
+                    style={{
+                      width: '35%',
+                      padding: '3% 2%',
+                    }}
+                  >
+                    {listTrains.map((train, i) => (
+                      <div
+                        key={i}
+                        className="flex items-center"
+                        style={{ gap: '6%' }}
                       >
                         {/* Rank */}
                         <span
-                          className="font-bold"
                           style={{
                             color: GREY,
-                            fontSize: 'min(4vw, 24px)',
-                            minWidth: '10%',
+                            fontSize: 'min(3vw, 18px)',
+                            minWidth: '15%',
+                            fontWeight: 'bold',
                           }}
                         >
-                          {train.rank}.
+                          {train.rank}
                         </span>
 
-                        {/* Line bullet */}
+                        {/* Full bullet (circle) - larger */}
                         <div
                           className="rounded-full flex items-center justify-center font-bold flex-shrink-0"
                           style={{
-                            width: 'min(8vw, 52px)',
-                            height: 'min(8vw, 52px)',
+                            width: 'min(6vw, 36px)',
+                            height: 'min(6vw, 36px)',
                             backgroundColor: LINE_COLORS[train.line] || '#666',
                             color: ['N', 'Q', 'R', 'W'].includes(train.line) ? '#000' : '#fff',
-                            fontSize: 'min(4vw, 24px)',
-                            boxShadow: `0 0 10px ${LINE_COLORS[train.line] || '#666'}`,
+                            fontSize: 'min(3vw, 18px)',
+                            boxShadow: `0 0 8px ${LINE_COLORS[train.line] || '#666'}`,
                           }}
                         >
                           {train.line}
                         </div>
 
                         {/* Time */}
-                        <div className="flex items-baseline">
-                          <span
-                            className="font-bold"
-                            style={{
-                              color: AMBER,
-                              fontSize: 'min(5vw, 32px)',
-                              textShadow: `0 0 8px ${AMBER}`,
-                            }}
-                          >
-                            {train.time}
-                          </span>
-                          <span
-                            style={{
-                              color: AMBER,
-                              fontSize: 'min(2.5vw, 16px)',
-                              marginLeft: '4px',
-                              textShadow: `0 0 6px ${AMBER}`,
-                            }}
-                          >
-                            mins
-                          </span>
-                        </div>
-                      </div>
-                    ))
-                  )}
-                </div>
-
-                {/* Divider line */}
-                <div
-                  className="self-stretch"
-                  style={{
-                    width: '1px',
-                    backgroundColor: '#333',
-                    margin: '2% 0',
-                  }}
-                />
-
-                {/* RIGHT SIDE - List of next trains */}
-                <div
-                  className="flex flex-col justify-around"
-                  style={{
-                    width: '35%',
-                    padding: '3% 2%',
-                  }}
-                >
-                  {listTrains.map((train, i) => (
-                    <div
-                      key={i}
-                      className="flex items-center"
-                      style={{ gap: '6%' }}
-                    >
-                      {/* Rank */}
-                      <span
-                        style={{
-                          color: GREY,
-                          fontSize: 'min(3vw, 18px)',
-                          minWidth: '15%',
-                          fontWeight: 'bold',
-                        }}
-                      >
-                        {train.rank}
-                      </span>
-
-                      {/* Full bullet (circle) - larger */}
-                      <div
-                        className="rounded-full flex items-center justify-center font-bold flex-shrink-0"
-                        style={{
-                          width: 'min(6vw, 36px)',
-                          height: 'min(6vw, 36px)',
-                          backgroundColor: LINE_COLORS[train.line] || '#666',
-                          color: ['N', 'Q', 'R', 'W'].includes(train.line) ? '#000' : '#fff',
-                          fontSize: 'min(3vw, 18px)',
-                          boxShadow: `0 0 8px ${LINE_COLORS[train.line] || '#666'}`,
-                        }}
-                      >
-                        {train.line}
+                        <span
+                          style={{
+                            color: AMBER,
+                            fontSize: 'min(3.5vw, 20px)',
+                            fontWeight: 'bold',
+                            textShadow: `0 0 6px ${AMBER}`,
+                          }}
+                        >
+                          {train.time}m
+                        </span>
                       </div>
-
-                      {/* Time */}
-                      <span
-                        style={{
-                          color: AMBER,
-                          fontSize: 'min(3.5vw, 20px)',
-                          fontWeight: 'bold',
-                          textShadow: `0 0 6px ${AMBER}`,
-                        }}
-                      >
-                        {train.time}m
-                      </span>
-                    </div>
-                  ))}
+                    ))}
+                  </div>
                 </div>
-              </div>
+              )}
             </div>
           </div>
 
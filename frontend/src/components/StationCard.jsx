@@ -30,7 +30,7 @@ const LINE_COLORS = {
 }
 
 function StationCard({ station, onRemove, onSetMain, onSetDirection, isMainView = false, onDragStart, isDragging, dragPos, dragDimensions }) {
-  const { name, direction, arrivals, isMain } = station
+  const { name, direction, arrivals, isMain, stale } = station
   const [menuOpen, setMenuOpen] = useState(false)
 
   const directionLabel = direction === 'N' ? 'Uptown' : direction === 'S' ? 'Downtown' : 'All'
@@ -71,6 +71,11 @@ function StationCard({ station, onRemove, onSetMain, onSetDirection, isMainView
           <div>
             <h3 className={`font-bold ${isMainView ? 'text-xl' : 'text-lg'}`}>{name}</h3>
             <span className="text-sm text-slate-400">{directionLabel}</span>
+            {stale && (
+              <span className="ml-2 text-xs text-amber-400" title="Saved data from before the last restart; live data is loading">
+                cached
+              </span>
+            )}
           </div>
         </div>
 
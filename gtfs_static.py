@@ -0,0 +1,241 @@
+"""
+Compiled stop -> routes -> feed index built from the MTA's static GTFS.
+
+The importer reads stops.txt, routes.txt, trips.txt and stop_times.txt
+(from the google_transit.zip download or an unpacked directory) once,
+offline, and writes a small binary file of fixed-size records:
+
+    header   <4sHHI   magic, format version, route count, stop count
+    routes   <8s8s    route_id, realtime feed group     (route_count rows)
+    stops    <8sQ     parent stop_id, bitmask of routes (stop_count rows, sorted by stop_id)
+
+StopIndex memory-maps that file and binary-searches the stop records in
+place, so loading it costs a header read rather than parsing CSVs.
+
+Usage:
+    curl -o google_transit.zip http://web.mta.info/developers/data/nyct/subway/google_transit.zip
+    python gtfs_static.py google_transit.zip        # Writes config.STOP_INDEX_PATH
+"""
+import argparse
+import csv
+import io
+import mmap
+import os
+import struct
+import zipfile
+import config
+
+MAGIC = b'SUBX'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHI')
+ROUTE = struct.Struct('<8s8s')
+STOP = struct.Struct('<8sQ')
+MAX_ROUTES = 64  # Bits in a stop's route mask
+
+# Realtime feed group (mta_client.FEED_PATHS key) carrying each route's trips
+ROUTE_FEEDS = {
+    "1": "123456S", "2": "123456S", "3": "123456S",
+    "4": "123456S", "5": "123456S", "6": "123456S", "GS": "123456S",
+    "7": "7",
+    "A": "ACE", "C": "ACE", "E": "ACE", "H": "ACE", "FS": "ACE",
+    "B": "BDFM", "D": "BDFM", "F": "BDFM", "M": "BDFM",
+    "N": "NQRW", "Q": "NQRW", "R": "NQRW", "W": "NQRW",
+    "J": "JZ", "Z": "JZ",
+    "L": "L",
+    "G": "G",
+    "SI": "SIR",
+}
+
+# Express variants are shown and alerted under their base line
+ROUTE_ALIASES = {"5X": "5", "6X": "6", "7X": "7", "FX": "F"}
+
+
+def _encode(value):
+    encoded = value.encode('ascii')
+    if len(encoded) > 8:
+        raise ValueError(f"ID too long for the index: {value!r}")
+    return encoded.ljust(8, b'\0')
+
+
+def _decode(value):
+    return value.rstrip(b'\0').decode('ascii')
+
+
+def _read_table(source, name):
+    """Yield the rows of a GTFS table as dicts, from a zip file or a directory."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            with archive.open(name) as raw:
+                yield from csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig'))
+    else:
+        with open(os.path.join(source, name), encoding='utf-8-sig', newline='') as f:
+            yield from csv.DictReader(f)
+
+
+def compile_stop_routes(source):
+    """
+    Work out which routes stop at each parent station.
+
+    Args:
+        source: Path to google_transit.zip or a directory of its .txt files
+
+    Returns:
+        Dict mapping parent stop_id to a set of route_ids
+    """
+    parents = {}
+    for row in _read_table(source, 'stops.txt'):
+        parents[row['stop_id']] = row.get('parent_station') or row['stop_id']
+
+    known_routes = {row['route_id'] for row in _read_table(source, 'routes.txt')}
+
+    trip_routes = {}
+    for row in _read_table(source, 'trips.txt'):
+        route = ROUTE_ALIASES.get(row['route_id'], row['route_id'])
+        if row['route_id'] in known_routes:
+            trip_routes[row['trip_id']] = route
+
+    stop_routes = {}
+    for row in _read_table(source, 'stop_times.txt'):
+        route = trip_routes.get(row['trip_id'])
+        if route is None:
+            continue
+        stop_id = row['stop_id']
+        parent = parents.get(stop_id, stop_id)
+        stop_routes.setdefault(parent, set()).add(route)
+
+    return stop_routes
+
+
+def write_index(stop_routes, path):
+    """
+    Write the binary stop index, replacing any existing file atomically.
+
+    Routes that no realtime feed carries are left out (with a warning).
+
+    Returns:
+        Number of stops written
+    """
+    routes = sorted({route for served in stop_routes.values() for route in served})
+    unknown = [route for route in routes if route not in ROUTE_FEEDS]
+    if unknown:
+        print(f"Skipping routes with no realtime feed: {', '.join(unknown)}")
+    routes = [route for route in routes if route in ROUTE_FEEDS]
+    if len(routes) > MAX_ROUTES:
+        raise ValueError(f"{len(routes)} routes don't fit in a {MAX_ROUTES}-bit mask")
+    route_bits = {route: 1 << i for i, route in enumerate(routes)}
+
+    stops = []
+    for stop_id in sorted(stop_routes):
+        mask = 0
+        for route in stop_routes[stop_id]:
+            mask |= route_bits.get(route, 0)
+        if mask:
+            stops.append((stop_id, mask))
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(routes), len(stops))]
+    parts.extend(ROUTE.pack(_encode(route), _encode(ROUTE_FEEDS[route])) for route in routes)
+    parts.extend(STOP.pack(_encode(stop_id), mask) for stop_id, mask in stops)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
+    return len(stops)
+
+
+class StopIndex:
+    """Read-only view of a compiled stop index, memory-mapped from disk."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: File written by write_index
+
+        Raises:
+            OSError: If the file can't be opened or mapped
+            ValueError: If it isn't a stop index of this version
+        """
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, route_count, stop_count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} stop index")
+        self._stops_offset = HEADER.size + route_count * ROUTE.size
+        if len(self._data) != self._stops_offset + stop_count * STOP.size:
+            raise ValueError(f"{path} is truncated")
+
+        # The route table is tiny, so decode it once
+        self.routes = []
+        self.route_feeds = []
+        for i in range(route_count):
+            route, feed = ROUTE.unpack_from(self._data, HEADER.size + i * ROUTE.size)
+            self.routes.append(_decode(route))
+            self.route_feeds.append(_decode(feed))
+        self._stop_count = stop_count
+
+    def __len__(self):
+        return self._stop_count
+
+    def __contains__(self, stop_id):
+        return self._mask(stop_id) is not None
+
+    def _mask(self, stop_id):
+        """Binary-search the stop records for a stop's route mask (None if absent)."""
+        try:
+            key = _encode(stop_id)
+        except (ValueError, UnicodeEncodeError):
+            return None
+
+        low, high = 0, self._stop_count
+        while low < high:
+            mid = (low + high) // 2
+            offset = self._stops_offset + mid * STOP.size
+            record_key = self._data[offset:offset + 8]
+            if record_key < key:
+                low = mid + 1
+            elif record_key > key:
+                high = mid
+            else:
+                return STOP.unpack_from(self._data, offset)[1]
+        return None
+
+    def routes_for_stop(self, stop_id):
+        """Routes serving a parent stop_id, in route order ([] if unknown)."""
+        mask = self._mask(stop_id) or 0
+        return [route for i, route in enumerate(self.routes) if mask >> i & 1]
+
+    def feeds_for_stop(self, stop_id):
+        """Realtime feed groups carrying a parent stop_id's trips ([] if unknown)."""
+        mask = self._mask(stop_id) or 0
+        feeds = []
+        for i, feed in enumerate(self.route_feeds):
+            if mask >> i & 1 and feed not in feeds:
+                feeds.append(feed)
+        return feeds
+
+
+def load(path):
+    """Open the stop index at path, or return None if it's missing or unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return StopIndex(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ignoring stop index {path}: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the MTA static GTFS into a stop -> routes -> feed index")
+    parser.add_argument('source', help="google_transit.zip or a directory of its .txt files")
+    parser.add_argument('--output', default=config.STOP_INDEX_PATH, help="Index file to write")
+    args = parser.parse_args()
+
+    count = write_index(compile_stop_routes(args.source), args.output)
+    print(f"Wrote {count} stops to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Headless stand-in for the rpi-rgb-led-matrix Python bindings.
+
+Provides the parts of RGBMatrix, RGBMatrixOptions and the graphics module
+that main.py uses (SetPixel, Clear, Fill, DrawText with BDF fonts,
+DrawCircle, DrawLine, SwapOnVSync), rendering into an in-memory RGB buffer
+with the same pixel algorithms as the C++ library. Every canvas counts its
+draw calls and pixel writes, and the matrix records the time and calls
+behind each frame, so the 64x32 layout can be measured and checked on any
+machine without the HAT.
+"""
+import time
+from types import SimpleNamespace
+
+REPLACEMENT_CODEPOINT = 0xFFFD
+
+
+class Color:
+    """RGB color, like graphics.Color."""
+
+    def __init__(self, red=0, green=0, blue=0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+
+class Font:
+    """A BDF bitmap font, like graphics.Font."""
+
+    def __init__(self):
+        self.height = 0
+        self.baseline = 0
+        self._glyphs = {}  # codepoint -> (device_width, width, height, x_offset, y_offset, rows)
+
+    def LoadFont(self, path):
+        """Parse a BDF font file (raises OSError if it can't be read)."""
+        glyph = None
+        rows = None
+
+        with open(path, 'r', encoding='latin-1') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                keyword = parts[0]
+
+                if rows is not None:
+                    if keyword == 'ENDCHAR':
+                        if glyph['encoding'] >= 0:
+                            self._glyphs[glyph['encoding']] = (
+                                glyph['dwidth'], glyph['width'], glyph['height'],
+                                glyph['x_offset'], glyph['y_offset'], self._unpack(rows, glyph['width'])
+                            )
+                        glyph = rows = None
+                    else:
+                        rows.append(keyword)
+                elif keyword == 'FONTBOUNDINGBOX':
+                    self.height = int(parts[2])
+                    self.baseline = self.height + int(parts[4])
+                elif keyword == 'STARTCHAR':
+                    glyph = {'encoding': -1, 'dwidth': 0, 'width': 0, 'height': 0, 'x_offset': 0, 'y_offset': 0}
+                elif glyph is not None and keyword == 'ENCODING':
+                    glyph['encoding'] = int(parts[1])
+                elif glyph is not None and keyword == 'DWIDTH':
+                    glyph['dwidth'] = int(parts[1])
+                elif glyph is not None and keyword == 'BBX':
+                    glyph['width'], glyph['height'], glyph['x_offset'], glyph['y_offset'] = map(int, parts[1:5])
+                elif glyph is not None and keyword == 'BITMAP':
+                    rows = []
+
+        return True
+
+    @staticmethod
+    def _unpack(rows, width):
+        # Each hex row is left-aligned: bit (bits - 1 - col) is column col
+        unpacked = []
+        for row in rows:
+            value = int(row, 16)
+            bits = len(row) * 4
+            unpacked.append(tuple(col for col in range(width) if value >> (bits - 1 - col) & 1))
+        return unpacked
+
+    def _glyph(self, codepoint):
+        return self._glyphs.get(codepoint) or self._glyphs.get(REPLACEMENT_CODEPOINT)
+
+    def CharacterWidth(self, codepoint):
+        """Advance width of a character, in pixels (-1 if the font lacks it)."""
+        glyph = self._glyph(codepoint)
+        return glyph[0] if glyph else -1
+
+    def DrawGlyph(self, canvas, x, y, color, codepoint):
+        glyph = self._glyph(codepoint)
+        if glyph is None:
+            return 0
+
+        device_width, width, height, x_offset, y_offset, rows = glyph
+        top = y - height - y_offset
+        for row, columns in enumerate(rows):
+            for col in columns:
+                canvas._set_pixel(x + x_offset + col, top + row, color.red, color.green, color.blue)
+        return device_width
+
+
+class Canvas:
+    """In-memory frame buffer with the FrameCanvas drawing surface."""
+
+    def __init__(self, width=64, height=32):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height * 3)
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the draw-call and pixel-write counters."""
+        self.calls = {}
+        self.pixel_writes = 0
+        self.first_draw_at = None
+
+    def _count(self, name):
+        if self.first_draw_at is None:
+            self.first_draw_at = time.perf_counter()
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _set_pixel(self, x, y, red, green, blue):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            offset = (y * self.width + x) * 3
+            self.pixels[offset] = red
+            self.pixels[offset + 1] = green
+            self.pixels[offset + 2] = blue
+            self.pixel_writes += 1
+
+    def SetPixel(self, x, y, red, green, blue):
+        self._count('SetPixel')
+        self._set_pixel(x, y, red, green, blue)
+
+    def Clear(self):
+        self._count('Clear')
+        self.pixels[:] = bytes(len(self.pixels))
+
+    def Fill(self, red, green, blue):
+        self._count('Fill')
+        self.pixels[:] = bytes((red, green, blue)) * (self.width * self.height)
+
+    def GetPixel(self, x, y):
+        """Return the (r, g, b) at a pixel."""
+        offset = (y * self.width + x) * 3
+        return tuple(self.pixels[offset:offset + 3])
+
+    def to_ppm(self):
+        """The frame as a binary PPM image, handy for eyeballing or regression snapshots."""
+        return f"P6 {self.width} {self.height} 255\n".encode() + bytes(self.pixels)
+
+
+def DrawText(canvas, font, x, y, color, text):
+    """Draw text with its baseline at y; returns the width drawn, like graphics.DrawText."""
+    canvas._count('DrawText')
+    start = x
+    for char in text:
+        x += font.DrawGlyph(canvas, x, y, color, ord(char))
+    return x - start
+
+
+def DrawCircle(canvas, x0, y0, radius, color):
+    """Midpoint circle outline, pixel-for-pixel like graphics.DrawCircle."""
+    canvas._count('DrawCircle')
+    x, y = radius, 0
+    radius_error = 1 - x
+    while y <= x:
+        for px, py in ((x, y), (y, x), (-x, y), (-y, x), (-x, -y), (-y, -x), (x, -y), (y, -x)):
+            canvas._set_pixel(x0 + px, y0 + py, color.red, color.green, color.blue)
+        y += 1
+        if radius_error < 0:
+            radius_error += 2 * y + 1
+        else:
+            x -= 1
+            radius_error += 2 * (y - x + 1)
+
+
+def DrawLine(canvas, x0, y0, x1, y1, color):
+    """Fixed-point line, pixel-for-pixel like graphics.DrawLine."""
+    canvas._count('DrawLine')
+    dx, dy = x1 - x0, y1 - y0
+    shift = 16
+
+    if abs(dx) > abs(dy):
+        if x1 < x0:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+            dx, dy = -dx, -dy
+        gradient = int((dy << shift) / dx)
+        y = 0x8000 + (y0 << shift)
+        for x in range(x0, x1 + 1):
+            canvas._set_pixel(x, y >> shift, color.red, color.green, color.blue)
+            y += gradient
+    elif dy != 0:
+        if y1 < y0:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+            dx, dy = -dx, -dy
+        gradient = int((dx << shift) / dy)
+        x = 0x8000 + (x0 << shift)
+        for y in range(y0, y1 + 1):
+            canvas._set_pixel(x >> shift, y, color.red, color.green, color.blue)
+            x += gradient
+    else:
+        canvas._set_pixel(x0, y0, color.red, color.green, color.blue)
+
+
+# Drop-in for `from rgbmatrix import graphics`
+graphics = SimpleNamespace(Color=Color, Font=Font, DrawText=DrawText, DrawCircle=DrawCircle, DrawLine=DrawLine)
+
+
+class MatrixOptions:
+    """Stand-in for RGBMatrixOptions; accepts and ignores hardware-only settings."""
+
+    def __init__(self):
+        self.rows = 32
+        self.cols = 64
+        self.chain_length = 1
+        self.parallel = 1
+        self.brightness = 100
+
+
+class HeadlessMatrix:
+    """
+    Stand-in for RGBMatrix that keeps the displayed frame in memory.
+
+    SwapOnVSync shows a canvas and hands back the other buffer, like the
+    hardware's double buffering. For every frame it records the time from
+    the canvas's first draw call to the swap, and the calls made.
+    """
+
+    def __init__(self, options=None):
+        options = options or MatrixOptions()
+        self.width = options.cols * options.chain_length
+        self.height = options.rows * options.parallel
+        self.brightness = options.brightness
+        self.front = Canvas(self.width, self.height)
+        self.frames = 0
+        self.last_frame = None
+
+    def CreateFrameCanvas(self):
+        return Canvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas):
+        started = canvas.first_draw_at
+        self.last_frame = {
+            'frame': self.frames,
+            'render_seconds': time.perf_counter() - started if started else 0.0,
+            'calls': dict(canvas.calls),
+            'pixel_writes': canvas.pixel_writes,
+        }
+        self.frames += 1
+
+        back, self.front = self.front, canvas
+        back.reset_stats()
+        return back
+
+    def Clear(self):
+        self.front.Clear()
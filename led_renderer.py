@@ -0,0 +1,251 @@
+"""
+The 64x32 LED layout, shared by the Pi display and the web app.
+
+main.py draws pages straight onto the matrix with rgbmatrix.graphics; the
+web app renders the same pages into an in-memory canvas (led_canvas) and
+serves the raw frame, so the simulator and the Pi show identical pixels.
+"""
+import os
+import led_canvas
+
+WIDTH = 64
+HEIGHT = 32
+
+FONT_DIR = os.environ.get("LED_FONT_DIR", "../rpi-rgb-led-matrix/fonts")
+
+BULLET_RADIUS = 6
+
+# Bullet colors by line; anything not listed is drawn red like the 1/2/3
+LINE_COLORS = {
+    '4': (0, 147, 60),     # 4, 5, 6
+    '5': (0, 147, 60),
+    '6': (0, 147, 60),
+    '7': (185, 51, 173),   # 7
+}
+DEFAULT_LINE_COLOR = (238, 53, 46)  # 1, 2, 3
+
+
+def circle_points(cx, cy, radius):
+    """Pixels graphics.DrawCircle sets for a circle (same midpoint algorithm)."""
+    points = set()
+    x, y = radius, 0
+    radius_error = 1 - x
+    while y <= x:
+        for px, py in ((x, y), (y, x), (-x, y), (-y, x), (-x, -y), (-y, -x), (x, -y), (y, -x)):
+            points.add((cx + px, cy + py))
+        y += 1
+        if radius_error < 0:
+            radius_error += 2 * y + 1
+        else:
+            x -= 1
+            radius_error += 2 * (y - x + 1)
+    return points
+
+
+def to_runs(points):
+    """
+    Turn a set of (x, y) pixels into horizontal runs.
+
+    Returns:
+        List of (y, x_start, x_end) covering exactly those pixels
+    """
+    runs = []
+    for y in sorted({py for _, py in points}):
+        xs = sorted(px for px, py in points if py == y)
+        run_start = previous = xs[0]
+        for x in xs[1:]:
+            if x != previous + 1:
+                runs.append((y, run_start, previous))
+                run_start = x
+            previous = x
+        runs.append((y, run_start, previous))
+    return runs
+
+
+def bullet_sprite(is_small=False):
+    """
+    Rasterize a bullet once, relative to its top-left corner.
+
+    The large bullet is the union of the concentric DrawCircle passes the
+    display has always drawn (radius 0 to BULLET_RADIUS), so it looks the same.
+    """
+    if is_small:
+        # Small 3x3 dot
+        return to_runs({(i, j) for i in range(3) for j in range(3)})
+
+    points = set()
+    for r in range(BULLET_RADIUS + 1):
+        points |= circle_points(BULLET_RADIUS, BULLET_RADIUS, r)
+    return to_runs(points)
+
+
+class RenderAssets:
+    """
+    Fonts, colors and bullet sprites, loaded once and reused every frame.
+
+    Loading a BDF font means reading and parsing a file, so it must not
+    happen in the render loop; bullets are pre-rasterized into horizontal
+    runs so a frame draws one line per run instead of re-tracing circles.
+    """
+
+    def __init__(self, graphics, font_dir=FONT_DIR):
+        """
+        Args:
+            graphics: Drawing backend: rgbmatrix.graphics on the Pi, or
+                led_canvas.graphics for in-memory rendering
+            font_dir: Directory holding 6x10.bdf and 4x6.bdf
+        """
+        self.graphics = graphics
+        self.font_large = self._load_font(font_dir, "6x10.bdf")
+        self.font_small = self._load_font(font_dir, "4x6.bdf")
+
+        self.amber = graphics.Color(255, 184, 28)
+        self.grey = graphics.Color(100, 100, 100)
+        self.white = graphics.Color(255, 255, 255)
+        self.red = graphics.Color(255, 0, 0)
+
+        self._shapes = {False: bullet_sprite(False), True: bullet_sprite(True)}
+        self._bullets = {}  # (line_name, is_small) -> (color, runs)
+
+    def _load_font(self, font_dir, name):
+        font = self.graphics.Font()
+        font.LoadFont(f"{font_dir}/{name}")
+        return font
+
+    def bullet(self, line_name, is_small=False):
+        """Return (color, runs) for a line's bullet, building it on first use."""
+        key = (line_name, is_small)
+        sprite = self._bullets.get(key)
+        if sprite is None:
+            color = self.graphics.Color(*LINE_COLORS.get(line_name, DEFAULT_LINE_COLOR))
+            sprite = self._bullets[key] = (color, self._shapes[is_small])
+        return sprite
+
+
+def draw_bullet(canvas, assets, x, y, line_name, is_small=False):
+    """Draws a subway line bullet (circle + text) from the cached sprites."""
+    graphics = assets.graphics
+    color, runs = assets.bullet(line_name, is_small)
+    for dy, x_start, x_end in runs:
+        graphics.DrawLine(canvas, x + x_start, y + dy, x + x_end, y + dy, color)
+
+    if is_small:
+        return
+
+    # Draw Text
+    text_x = x + 4
+    if len(line_name) > 1: text_x = x + 2
+    graphics.DrawText(canvas, assets.font_small, text_x, y + 9, assets.white, line_name)
+
+
+def build_page(upcoming, now):
+    """
+    Turn upcoming (arrival_time, line) pairs into the ranked rows the display draws.
+
+    Returns:
+        List of {rank, line, time} dicts, time in whole minutes from now
+    """
+    return [
+        {'rank': rank, 'line': line, 'time': int((arr_time - now) / 60)}
+        for rank, (arr_time, line) in enumerate(upcoming, 1)
+    ]
+
+
+def draw_page(canvas, assets, current_page_data):
+    """Draw one page of arrivals (or the NO TRAINS message) onto a cleared canvas."""
+    graphics = assets.graphics
+    font_large = assets.font_large
+    font_small = assets.font_small
+    amber = assets.amber
+    grey = assets.grey
+
+    if current_page_data:
+        # --- LEFT SIDE: Top 2 Trains ---
+        for i, train in enumerate(current_page_data[:2]):
+            y_offset = i * 16
+            
+            # 1. Rank "1."
+            graphics.DrawText(canvas, font_large, 1, y_offset + 10, grey, f"{train['rank']}.")
+            
+            # 2. Bullet
+            draw_bullet(canvas, assets, 13, y_offset + 1, train['line'], is_small=False)
+            
+            # 3. Time "5 mins"
+            # Number in large font
+            time_val = str(train['time'])
+            graphics.DrawText(canvas, font_large, 29, y_offset + 10, amber, time_val)
+            # " mins" in small font to save space
+            num_width = len(time_val) * 6
+            graphics.DrawText(canvas, font_small, 29 + num_width + 1, y_offset + 10, amber, " mins")
+
+        # --- RIGHT SIDE: List (Rank 3+) ---
+        # Shifted further left (start_x = 46) and made taller (y_pos = i * 7)
+        start_x = 46
+        for i, train in enumerate(current_page_data[2:]):
+            y_pos = i * 7 # Increased height from 6 to 7
+            if y_pos > 25: break 
+
+            # Rank
+            graphics.DrawText(canvas, font_small, start_x, y_pos + 5, grey, str(train['rank']))
+            
+            # Small Bullet (3x3)
+            draw_bullet(canvas, assets, start_x + 5, y_pos + 1, train['line'], is_small=True)
+            
+            # Time (Append 'm')
+            graphics.DrawText(canvas, font_small, start_x + 9, y_pos + 5, amber, f"{train['time']}m")
+
+    else:
+        graphics.DrawText(canvas, font_large, 4, 20, assets.red, "NO TRAINS")
+
+
+def page_from_arrivals(stations, station_uuids=None, direction='all', limit=7):
+    """
+    Pick the trains for the display from an /api/arrivals payload.
+
+    Arrivals of the chosen stations are merged, sorted by time and ranked,
+    exactly as the simulator has always done it.
+
+    Args:
+        stations: /api/arrivals payload (list of station dicts with arrivals)
+        station_uuids: Stations to include (None for all of them)
+        direction: 'all', or 'N'/'S' to only include stations configured that way
+        limit: Rows to keep
+
+    Returns:
+        List of {rank, line, time} dicts
+    """
+    merged = []
+    for station in stations:
+        if station_uuids is not None and station['uuid'] not in station_uuids:
+            continue
+        if direction != 'all' and station['direction'] != direction:
+            continue
+        merged.extend(station['arrivals'])
+
+    merged.sort(key=lambda arrival: arrival['time'])
+    return [
+        {'rank': rank, 'line': arrival['line'], 'time': arrival['time']}
+        for rank, arrival in enumerate(merged[:limit], 1)
+    ]
+
+
+class FrameRenderer:
+    """Renders pages to raw RGB frames (WIDTH x HEIGHT x 3 bytes, row-major) in memory."""
+
+    def __init__(self, font_dir=FONT_DIR):
+        self.assets = RenderAssets(led_canvas.graphics, font_dir)
+
+    def render(self, page):
+        """Return the frame for a page as bytes."""
+        canvas = led_canvas.Canvas(WIDTH, HEIGHT)
+        draw_page(canvas, self.assets, page)
+        return bytes(canvas.pixels)
+
+
+def blit(canvas, frame, width=WIDTH):
+    """Copy a raw RGB frame onto a cleared canvas, skipping black pixels."""
+    for offset in range(0, len(frame), 3):
+        red, green, blue = frame[offset], frame[offset + 1], frame[offset + 2]
+        if red or green or blue:
+            pixel = offset // 3
+            canvas.SetPixel(pixel % width, pixel // width, red, green, blue)
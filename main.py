@@ -1,43 +1,69 @@
+import os
 import time
+import requests
 from mta_client import MTAClient
+from led_renderer import HEIGHT, WIDTH, RenderAssets, blit, build_page, draw_page
 import config
-from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
-
-def draw_bullet(canvas, x, y, line_name, is_small=False):
-    """Draws a subway line bullet (circle + text)."""
-    # Colors
-    red = graphics.Color(238, 53, 46)   # 1, 2, 3
-    green = graphics.Color(0, 147, 60)  # 4, 5, 6
-    purple = graphics.Color(185, 51, 173) # 7
-    white = graphics.Color(255, 255, 255)
-    
-    # Determine color
-    bg_color = red
-    if line_name in ['4', '5', '6']:
-        bg_color = green
-    elif line_name == '7':
-        bg_color = purple
-
-    if is_small:
-        # Small 3x3 dot
-        for i in range(3):
-            for j in range(3):
-                canvas.SetPixel(x + i, y + j, bg_color.red, bg_color.green, bg_color.blue)
-        return
 
-    # Large Bullet (Regular)
-    radius = 6
-    for r in range(radius):
-        graphics.DrawCircle(canvas, x + radius, y + radius, r, bg_color)
-    graphics.DrawCircle(canvas, x + radius, y + radius, radius, bg_color) # Outline
-    
-    # Draw Text
-    font = graphics.Font()
-    font.LoadFont("../rpi-rgb-led-matrix/fonts/4x6.bdf") 
-    
-    text_x = x + 4
-    if len(line_name) > 1: text_x = x + 2
-    graphics.DrawText(canvas, font, text_x, y + 9, white, line_name)
+# The real matrix when its bindings are installed; otherwise (or with
+# LED_HEADLESS=1) an in-memory canvas, so the layout runs anywhere
+if os.environ.get("LED_HEADLESS"):
+    from led_canvas import HeadlessMatrix as RGBMatrix, MatrixOptions as RGBMatrixOptions, graphics
+else:
+    try:
+        from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
+    except ImportError:
+        print("rgbmatrix not installed; rendering to an in-memory canvas")
+        from led_canvas import HeadlessMatrix as RGBMatrix, MatrixOptions as RGBMatrixOptions, graphics
+
+
+def seconds_until_next_minute(upcoming, now):
+    """Seconds until any displayed "minutes away" value changes (at most a minute)."""
+    wait = 60.0
+    for arr_time, line in upcoming:
+        wait = min(wait, (arr_time - now) % 60 or 60)
+    return wait + 0.05
+
+
+def show_frame(matrix, canvas):
+    """Swap a drawn canvas onto the matrix; returns the canvas to draw the next frame on."""
+    canvas = matrix.SwapOnVSync(canvas)
+
+    # The headless canvas reports what each frame cost
+    frame = getattr(matrix, 'last_frame', None)
+    if frame:
+        print(f"Frame {frame['frame']}: {frame['render_seconds'] * 1000:.2f}ms, "
+              f"{sum(frame['calls'].values())} draw calls, {frame['pixel_writes']} pixels")
+    return canvas
+
+
+def run_from_frames(matrix, canvas, url):
+    """
+    Display frames rendered by the web app's /api/led/frame instead of
+    fetching and laying out arrivals here.
+
+    Polls with the last ETag, so an unchanged frame is a 304 and nothing is
+    redrawn; on errors the last frame simply stays up.
+    """
+    session = requests.Session()
+    etag = None
+
+    while True:
+        try:
+            headers = {'If-None-Match': etag} if etag else {}
+            response = session.get(url, headers=headers, timeout=config.FEED_TIMEOUT)
+            if response.status_code == 200 and len(response.content) == WIDTH * HEIGHT * 3:
+                canvas.Clear()
+                blit(canvas, response.content)
+                canvas = show_frame(matrix, canvas)
+                etag = response.headers.get('ETag')
+            elif response.status_code != 304:
+                print(f"Unexpected frame response: HTTP {response.status_code}, {len(response.content)} bytes")
+        except requests.RequestException as e:
+            print(f"Error fetching frame: {e}")
+
+        time.sleep(config.LED_FRAME_POLL)
+
 
 def main():
     print("Starting RGB Matrix display application...")
@@ -56,67 +82,55 @@ def main():
     matrix = RGBMatrix(options = options)
     canvas = matrix.CreateFrameCanvas()
     
-    # Load Fonts
-    font_large = graphics.Font()
-    font_large.LoadFont("../rpi-rgb-led-matrix/fonts/6x10.bdf") 
-    
-    font_small = graphics.Font()
-    font_small.LoadFont("../rpi-rgb-led-matrix/fonts/4x6.bdf")
+    if config.LED_FRAME_URL:
+        print(f"Showing frames from {config.LED_FRAME_URL}")
+        try:
+            run_from_frames(matrix, canvas, config.LED_FRAME_URL)
+        except KeyboardInterrupt:
+            print("Exiting application.")
+            matrix.Clear()
+        return
 
-    amber = graphics.Color(255, 184, 28)
-    grey = graphics.Color(100, 100, 100)
-    
+    # Load fonts, colors and bullet sprites once
+    assets = RenderAssets(graphics)
+
+    # The client's background refresher is the producer: it keeps the feed
+    # snapshot current on its own thread, so nothing below ever waits on
+    # the MTA and a slow or failed fetch just leaves the last data up
     mta_client = MTAClient()
+    stop_id = config.TARGET_STATION_ID + config.DIRECTION
+    mta_client.watch_feeds([config.FEED_URL])
+    mta_client.watch_stops([stop_id])
+    # Show the last good data saved on disk while the first fetch is in flight
+    mta_client.restore_snapshots()
+    mta_client.start_background_refresh()
+
+    drawn_page = None
+    data_version = mta_client.data_version
 
     try:
         while True:
-            current_page_data = mta_client.get_current_page()
-            canvas.Clear()
-
-            if current_page_data:
-                # --- LEFT SIDE: Top 2 Trains ---
-                for i, train in enumerate(current_page_data[:2]):
-                    y_offset = i * 16
-                    
-                    # 1. Rank "1."
-                    graphics.DrawText(canvas, font_large, 1, y_offset + 10, grey, f"{train['rank']}.")
-                    
-                    # 2. Bullet
-                    draw_bullet(canvas, 13, y_offset + 1, train['line'], is_small=False)
-                    
-                    # 3. Time "5 mins"
-                    # Number in large font
-                    time_val = str(train['time'])
-                    graphics.DrawText(canvas, font_large, 29, y_offset + 10, amber, time_val)
-                    # " mins" in small font to save space
-                    num_width = len(time_val) * 6
-                    graphics.DrawText(canvas, font_small, 29 + num_width + 1, y_offset + 10, amber, " mins")
-
-                # --- RIGHT SIDE: List (Rank 3+) ---
-                # Shifted further left (start_x = 46) and made taller (y_pos = i * 7)
-                start_x = 46
-                for i, train in enumerate(current_page_data[2:]):
-                    y_pos = i * 7 # Increased height from 6 to 7
-                    if y_pos > 25: break 
-
-                    # Rank
-                    graphics.DrawText(canvas, font_small, start_x, y_pos + 5, grey, str(train['rank']))
-                    
-                    # Small Bullet (3x3)
-                    draw_bullet(canvas, start_x + 5, y_pos + 1, train['line'], is_small=True)
-                    
-                    # Time (Append 'm')
-                    graphics.DrawText(canvas, font_small, start_x + 9, y_pos + 5, amber, f"{train['time']}m")
-
-            else:
-                graphics.DrawText(canvas, font_large, 4, 20, graphics.Color(255, 0, 0), "NO TRAINS")
-
-            canvas = matrix.SwapOnVSync(canvas)
-            time.sleep(config.PAGE_DURATION)
-
+            upcoming = mta_client.upcoming_arrivals(config.FEED_URL, stop_id, limit=6)
+            now = time.time()
+            current_page_data = build_page(upcoming, now)
+
+            # Redraw only when what's on screen would change; before the
+            # first snapshot arrives, keep the display blank
+            loaded = config.FEED_URL in mta_client.feed_cache
+            if current_page_data != drawn_page and (current_page_data or loaded):
+                canvas.Clear()
+                draw_page(canvas, assets, current_page_data)
+                canvas = show_frame(matrix, canvas)
+                drawn_page = current_page_data
+
+            # Sleep until new data arrives or a displayed minute ticks over
+            data_version = mta_client.wait_for_change(
+                data_version, timeout=seconds_until_next_minute(upcoming, now)
+            )
 
     except KeyboardInterrupt:
         print("Exiting application.")
+        mta_client.stop_background_refresh()
         matrix.Clear()
 
 if __name__ == "__main__":
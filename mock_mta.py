@@ -0,0 +1,187 @@
+"""
+Local stand-in for the MTA's GTFS-realtime API, for offline and load testing.
+
+Serves every FEED_URLS feed and the alerts feed from feed_fixtures, at the
+same paths as api-endpoint.mta.info, with a new version of each feed every
+--update-interval seconds. Latency, HTTP errors and truncated bodies can be
+injected to see how the app copes with a slow or flaky API.
+
+Usage:
+    python mock_mta.py --port 8001 --latency 300 --error-rate 0.05
+    MTA_API_BASE=http://localhost:8001 python app.py
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import feed_fixtures
+from mta_client import ALERTS_PATH, FEED_PATHS
+
+SCHEDULE_WINDOW = 1800  # Seconds each generated timetable (and alerts set) stays in use
+
+
+class MockFeeds:
+    """Generates the current version of each feed on demand and caches it until the next update."""
+
+    def __init__(self, scale=1.0, trips=None, stops_per_trip=feed_fixtures.STOPS_PER_TRIP,
+                 alerts=feed_fixtures.ALERT_COUNT, update_interval=15, seed=0):
+        self.scale = scale
+        self.trips = trips
+        self.stops_per_trip = stops_per_trip
+        self.alerts = alerts
+        self.update_interval = max(1, int(update_interval))
+        self.seed = seed
+
+        # Decoded path -> feed group ("alerts" for the alerts feed)
+        self.groups = {unquote(path): group for group, path in FEED_PATHS.items()}
+        self.groups[unquote(ALERTS_PATH)] = "alerts"
+
+        self._cache = {}  # group -> (version, body, etag)
+        self._locks = {group: threading.Lock() for group in self.groups.values()}
+
+    def group_for_path(self, path):
+        """Return the feed group served at a request path, or None."""
+        path = unquote(path.split('?', 1)[0])
+        for feed_path, group in self.groups.items():
+            # Accept both http://host/nyct%2Fgtfs and the MTA's full
+            # /Dataservice/mtagtfsfeeds/nyct%2Fgtfs form
+            if path == '/' + feed_path or path.endswith('/' + feed_path):
+                return group
+        return None
+
+    def get(self, group):
+        """
+        Return the current version of a feed.
+
+        Returns:
+            Tuple of (version timestamp, body bytes, ETag)
+        """
+        now = int(time.time())
+        version = now - now % self.update_interval
+        window = version - version % SCHEDULE_WINDOW
+
+        with self._locks[group]:
+            cached = self._cache.get(group)
+            if cached and cached[0] == version:
+                return cached
+
+            if group == "alerts":
+                # Alerts change with the timetable, not on every update
+                body = feed_fixtures.make_alerts_feed(alerts=self.alerts, now=window, seed=self.seed + window)
+            else:
+                trips = self.trips
+                if trips is None:
+                    trips = max(1, int(feed_fixtures.TRIPS_PER_FEED[group] * self.scale))
+                body = feed_fixtures.make_trip_feed(
+                    group, trips=trips, stops_per_trip=self.stops_per_trip,
+                    now=version, seed=self.seed + window, origin=window
+                )
+
+            entry = (version, body, '"%s"' % hashlib.sha1(body).hexdigest()[:16])
+            self._cache[group] = entry
+            return entry
+
+
+def make_handler(feeds, latency=0, jitter=0, error_rate=0, corrupt_rate=0, verbose=False):
+    """
+    Build a request handler class serving `feeds` with the given failure injection.
+
+    Args:
+        feeds: MockFeeds instance
+        latency: Mean added response delay in milliseconds
+        jitter: Standard deviation of the added delay in milliseconds
+        error_rate: Fraction of requests answered with a 503
+        corrupt_rate: Fraction of feed responses cut off halfway through the body
+        verbose: Log every request
+    """
+    rng = random.Random()
+
+    class MockMTAHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def do_GET(self):
+            group = feeds.group_for_path(self.path)
+            if group is None:
+                self._send(404, b"Not found\n", "text/plain")
+                return
+
+            if latency or jitter:
+                time.sleep(max(0.0, rng.gauss(latency, jitter)) / 1000)
+
+            if rng.random() < error_rate:
+                self._send(503, b"Service unavailable\n", "text/plain")
+                return
+
+            version, body, etag = feeds.get(group)
+            last_modified = formatdate(version, usegmt=True)
+
+            if (self.headers.get('If-None-Match') == etag
+                    or self.headers.get('If-Modified-Since') == last_modified):
+                self._send(304, b"", None, {'ETag': etag, 'Last-Modified': last_modified})
+                return
+
+            if rng.random() < corrupt_rate:
+                body = body[:len(body) // 2]
+
+            self._send(200, body, "application/octet-stream", {'ETag': etag, 'Last-Modified': last_modified})
+
+        def _send(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            if content_type:
+                self.send_header('Content-Type', content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return MockMTAHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock MTA GTFS-realtime server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplier on each feed's default trip count")
+    parser.add_argument('--trips', type=int, help="Trips per feed (overrides --scale)")
+    parser.add_argument('--stops-per-trip', type=int, default=feed_fixtures.STOPS_PER_TRIP)
+    parser.add_argument('--alerts', type=int, default=feed_fixtures.ALERT_COUNT, help="Alerts in the alerts feed")
+    parser.add_argument('--update-interval', type=int, default=15, help="Seconds between new feed versions")
+    parser.add_argument('--latency', type=float, default=0, help="Mean added latency in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Latency standard deviation in ms")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of requests answered with a 503")
+    parser.add_argument('--corrupt-rate', type=float, default=0, help="Fraction of responses with a truncated body")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    feeds = MockFeeds(
+        scale=args.scale, trips=args.trips, stops_per_trip=args.stops_per_trip,
+        alerts=args.alerts, update_interval=args.update_interval, seed=args.seed
+    )
+    handler = make_handler(
+        feeds, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        corrupt_rate=args.corrupt_rate, verbose=args.verbose
+    )
+
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"Mock MTA API on http://{args.host}:{args.port} (set MTA_API_BASE to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
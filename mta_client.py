@@ -1,24 +1,73 @@
+import contextvars
+import hashlib
+import heapq
+import os
+import re
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
+from google.protobuf.message import DecodeError
 from google.transit import gtfs_realtime_pb2
 import config
-
-# Feed URLs for different subway line groups
-FEED_URLS = {
-    "123456S": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs",
-    "NQRW": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-nqrw",
-    "BDFM": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-bdfm",
-    "ACE": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-ace",
-    "JZ": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-jz",
-    "L": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-l",
-    "G": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-g",
-    "7": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-7",
-    "SIR": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-si",
+import gtfs_static
+from arrivals_log import ArrivalsRecorder
+import metrics
+import timing
+from feed_store import SharedFeedStore
+
+# Feed paths for different subway line groups, relative to config.MTA_API_BASE
+FEED_PATHS = {
+    "123456S": "nyct%2Fgtfs",
+    "NQRW": "nyct%2Fgtfs-nqrw",
+    "BDFM": "nyct%2Fgtfs-bdfm",
+    "ACE": "nyct%2Fgtfs-ace",
+    "JZ": "nyct%2Fgtfs-jz",
+    "L": "nyct%2Fgtfs-l",
+    "G": "nyct%2Fgtfs-g",
+    "7": "nyct%2Fgtfs-7",
+    "SIR": "nyct%2Fgtfs-si",
 }
+FEED_URLS = {group: f"{config.MTA_API_BASE}/{path}" for group, path in FEED_PATHS.items()}
 
-ALERTS_URL = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/camsys%2Fsubway-alerts"
+ALERTS_PATH = "camsys%2Fsubway-alerts"
+ALERTS_URL = f"{config.MTA_API_BASE}/{ALERTS_PATH}"
 ALERTS_CACHE_TTL = 60  # Cache alerts for 60 seconds
 
+# Adaptive background refresh (see FeedSchedule)
+CADENCE_WEIGHT = 0.2   # Weight of each newly observed publish interval in a feed's cadence estimate
+DELAY_SAMPLES = 8      # Recent publish-to-seen delays kept per feed; the smallest is used
+DEMAND_RENEW = 60      # Seconds between a web worker re-registering the feeds it serves with the fetcher
+
+# Short feed names used as metric labels: the FEED_URLS group, or "alerts"
+FEED_NAMES = {url: group for group, url in FEED_URLS.items()}
+FEED_NAMES[ALERTS_URL] = "alerts"
+
+FETCH_SECONDS = metrics.histogram('subway_feed_fetch_seconds', 'Time to download a feed from the MTA', ['feed'])
+FEED_RESPONSES = metrics.counter('subway_feed_responses_total', 'MTA responses by HTTP status code', ['feed', 'code'])
+FEED_BYTES = metrics.counter('subway_feed_bytes_total', 'Feed bytes downloaded from the MTA', ['feed'])
+PARSE_SECONDS = metrics.histogram('subway_feed_parse_seconds', 'Time to parse and index a changed feed', ['feed'])
+FEED_UNCHANGED = metrics.counter(
+    'subway_feed_unchanged_total', 'Fetches that reused the cached feed instead of parsing it', ['feed', 'reason']
+)
+FEED_ENTITIES = metrics.gauge('subway_feed_entities', 'Entities in the latest version of a feed', ['feed'])
+FEED_HEADER_AGE = metrics.gauge(
+    'subway_feed_header_age_seconds', 'Age of the cached feed according to its header timestamp', ['feed']
+)
+FEED_CADENCE = metrics.gauge(
+    'subway_feed_cadence_seconds', 'Estimated seconds between updates the MTA publishes', ['feed']
+)
+FEED_ERRORS = metrics.counter('subway_feed_errors_total', 'Failed feed refreshes by exception type', ['feed', 'error'])
+CACHE_REQUESTS = metrics.counter('subway_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+# Alert severity keywords, checked in order against the header and description
+SEVERITY_PATTERNS = [
+    ("major", re.compile("suspended|no service|service suspended|major delays")),
+    ("minor", re.compile("delays|delayed|slow speeds|signal problems")),
+]
+
 # Map station ID prefixes to their feed groups
 # Numeric IDs (1xx, 2xx, etc.) are typically for numbered lines
 # Letter prefixes indicate specific line groups
@@ -57,6 +106,10 @@ STATION_PREFIX_TO_FEED = {
 }
 
 
+# Compiled from the static GTFS by gtfs_static.py; None falls back to the prefix guesses
+STOP_INDEX = gtfs_static.load(config.STOP_INDEX_PATH)
+
+
 def get_feed_for_station(station_id):
     """Determine which feed URL to use based on station ID prefix."""
     if not station_id:
@@ -67,6 +120,21 @@ def get_feed_for_station(station_id):
     return FEED_URLS[feed_key]
 
 
+def get_feeds_for_station(station_id):
+    """
+    Return every feed URL carrying trips that stop at a station.
+
+    Uses the static GTFS stop index when one is installed, so stations served
+    by several feed groups (e.g. Times Sq) get all of them; otherwise falls
+    back to the single feed guessed from the station ID prefix.
+    """
+    if STOP_INDEX is not None and station_id:
+        feed_urls = [FEED_URLS[group] for group in STOP_INDEX.feeds_for_stop(station_id) if group in FEED_URLS]
+        if feed_urls:
+            return feed_urls
+    return [get_feed_for_station(station_id)]
+
+
 # Destination/terminal stations for each line by direction
 # N = Uptown/Bronx/Queens, S = Downtown/Brooklyn
 LINE_DESTINATIONS = {
@@ -104,10 +172,15 @@ def get_destination_for_line(route_id, direction):
 
 
 def get_lines_for_station(station_id):
-    """Return likely lines that serve this station based on prefix."""
+    """Return the lines that serve this station: from the stop index, else guessed from the prefix."""
     if not station_id:
         return []
 
+    if STOP_INDEX is not None:
+        routes = STOP_INDEX.routes_for_stop(station_id)
+        if routes:
+            return routes
+
     prefix = station_id[0]
     line_map = {
         "1": ["1", "2", "3"],
@@ -135,51 +208,952 @@ def get_lines_for_station(station_id):
     return line_map.get(prefix, [])
 
 
+def build_stop_index(feed):
+    """
+    Index a parsed feed's trip updates by stop in a single pass.
+
+    Args:
+        feed: Parsed gtfs_realtime_pb2.FeedMessage
+
+    Returns:
+        Dict mapping stop_id to a list of (arrival_time, route_id, trip_id)
+        tuples sorted by arrival time
+    """
+    index = {}
+
+    for entity in feed.entity:
+        _index_trip_update(index, entity)
+
+    for stop_arrivals in index.values():
+        stop_arrivals.sort()
+
+    return index
+
+
+def _index_trip_update(index, entity, stop_ids=None):
+    """Add an entity's stop time updates to a stop index, optionally only for some stops."""
+    if not entity.HasField('trip_update'):
+        return
+
+    trip = entity.trip_update.trip
+    route_id = trip.route_id
+    trip_id = trip.trip_id
+
+    for update in entity.trip_update.stop_time_update:
+        if stop_ids is not None and update.stop_id not in stop_ids:
+            continue
+        # Departure-only updates (e.g. at a terminal) have no arrival time
+        if update.arrival.time <= 0:
+            continue
+        entry = (update.arrival.time, route_id, trip_id)
+        stop_arrivals = index.get(update.stop_id)
+        if stop_arrivals is None:
+            index[update.stop_id] = [entry]
+        else:
+            stop_arrivals.append(entry)
+
+
+# --- Selective decoding ---
+#
+# A FeedMessage is a header (field 1) followed by one length-delimited entity
+# (field 2) per trip. Rather than materializing every entity, walk the
+# top-level fields on the wire and only hand the protobuf library entities
+# whose bytes contain an encoded stop_id we care about.
+
+FEED_HEADER_FIELD = 1
+FEED_ENTITY_FIELD = 2
+STOP_ID_TAG = b'\x22'  # StopTimeUpdate.stop_id: field 4, length-delimited
+
+
+def _read_varint(buf, pos):
+    """
+    Decode a protobuf varint at pos. Returns (value, position after it).
+
+    Raises:
+        DecodeError: If the buffer ends inside the varint
+    """
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise DecodeError("Truncated varint in feed")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_top_level_fields(buf):
+    """
+    Yield (field_number, start, end) for each length-delimited top-level field.
+
+    Raises:
+        DecodeError: If a field runs past the end of the buffer (a truncated
+            body or short read), like FeedMessage.FromString would
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field_number, wire_type = key >> 3, key & 0x7
+        if wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise DecodeError(f"Truncated field {field_number} in feed")
+            yield field_number, pos, pos + length
+            pos += length
+        elif wire_type == 0:
+            _, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type} in feed")
+        if pos > end:
+            raise DecodeError(f"Truncated field {field_number} in feed")
+
+
+def compile_stop_pattern(stop_ids):
+    """Compile a regex matching any of these stop_ids as encoded StopTimeUpdate fields."""
+    encoded = []
+    for stop_id in sorted(stop_ids):
+        raw = stop_id.encode()
+        encoded.append(re.escape(STOP_ID_TAG + bytes([len(raw)]) + raw))
+    return re.compile(b'|'.join(encoded))
+
+
+def read_feed_timestamp(content):
+    """Return the FeedHeader timestamp without decoding any entities (0 if absent)."""
+    for field_number, start, end in _iter_top_level_fields(content):
+        if field_number == FEED_HEADER_FIELD:
+            return gtfs_realtime_pb2.FeedHeader.FromString(content[start:end]).timestamp
+    return 0
+
+
+def count_feed_entities(content):
+    """Count a feed's entities without decoding them."""
+    return sum(1 for field_number, _, _ in _iter_top_level_fields(content) if field_number == FEED_ENTITY_FIELD)
+
+
+def build_watched_stop_index(content, stop_ids, stop_pattern=None):
+    """
+    Build a stop index for only the given stops straight from the wire bytes.
+
+    One regex pass over the whole body finds every encoded occurrence of a
+    watched stop_id; only the entities containing one are decoded. All other
+    trip updates are skipped without creating any Python objects.
+
+    Args:
+        content: Serialized FeedMessage bytes
+        stop_ids: Set of stop_ids to index (e.g. {'120S', 'A21N'})
+        stop_pattern: Optional precompiled compile_stop_pattern(stop_ids)
+
+    Returns:
+        Same shape as build_stop_index, restricted to stop_ids
+    """
+    index = {}
+    if not stop_ids:
+        return index
+
+    pattern = stop_pattern or compile_stop_pattern(stop_ids)
+    hits = [match.start() for match in pattern.finditer(content)]
+    hit = 0
+
+    # Walk every field even after the last hit, so a truncated body raises
+    # instead of yielding a partial index
+    for field_number, start, end in _iter_top_level_fields(content):
+        if field_number != FEED_ENTITY_FIELD:
+            continue
+        while hit < len(hits) and hits[hit] < start:
+            hit += 1
+        if hit == len(hits) or hits[hit] >= end:
+            continue
+
+        entity = gtfs_realtime_pb2.FeedEntity.FromString(content[start:end])
+        _index_trip_update(index, entity, stop_ids)
+
+    for stop_arrivals in index.values():
+        stop_arrivals.sort()
+
+    return index
+
+
+class FeedSchedule:
+    """
+    When the background refresher should next poll one feed.
+
+    The MTA regenerates each feed on its own cadence. The interval between
+    successive header timestamps estimates that cadence, and the age of each
+    new header when first seen estimates the publish delay plus any clock
+    skew, so the next poll lands just after the next expected update. A
+    poll that finds nothing new retries after REFRESH_MIN seconds, doubling
+    up to the cadence; failed polls back off exponentially up to
+    REFRESH_BACKOFF_MAX.
+    """
+
+    def __init__(self, cadence):
+        """
+        Args:
+            cadence: Initial guess at the seconds between updates
+        """
+        self.cadence = cadence
+        self.timestamp = None  # Latest header timestamp seen
+        self.intervals = 0     # Publish intervals measured so far
+        self.delays = deque(maxlen=DELAY_SAMPLES)
+        self.misses = 0        # Polls in a row that found no new update
+        self.errors = 0        # Failed polls in a row
+        self.next_due = 0
+
+    def updated(self, timestamp, now):
+        """Schedule the next poll after one that returned a feed with this header timestamp."""
+        self.errors = 0
+        if not timestamp or timestamp == self.timestamp:
+            self.misses += 1
+            self.next_due = now + min(self.cadence, config.REFRESH_MIN * 2 ** (self.misses - 1))
+            return
+
+        if self.timestamp and timestamp > self.timestamp:
+            interval = timestamp - self.timestamp
+            if not self.intervals:
+                self.cadence = interval
+            else:
+                # An interval spanning versions we never saw counts as that many
+                if not self.misses:
+                    interval /= max(1, round(interval / self.cadence))
+                self.cadence += CADENCE_WEIGHT * (interval - self.cadence)
+            self.cadence = min(max(self.cadence, config.REFRESH_MIN), config.REFRESH_MAX)
+            self.intervals += 1
+
+        self.timestamp = timestamp
+        self.misses = 0
+        self.delays.append(now - timestamp)
+        if self.intervals:
+            self.next_due = max(timestamp + self.cadence + min(self.delays), now + config.REFRESH_MIN)
+        else:
+            # No interval measured yet: look again soon to catch the next version
+            self.next_due = now + config.REFRESH_MIN
+
+    def failed(self, now):
+        """Schedule a retry after a failed or timed-out poll."""
+        self.errors += 1
+        self.next_due = now + min(config.REFRESH_BACKOFF_MAX, self.cadence * 2 ** (self.errors - 1))
+
+
 class MTAClient:
     def __init__(self):
         self.cached_arrivals = []
         self.last_fetch_time = 0
         # Cache for multi-station fetches: {station_key: {arrivals: [], last_fetch: timestamp}}
         self.station_cache = {}
-        # Cache for service alerts
-        self.alerts_cache = []
+        # Stop indexes shared by all stations on a feed:
+        # {feed_url: {index: {}, timestamp: int, hash: bytes, stops: frozenset or None,
+        #              last_fetch: timestamp, updated_at: timestamp, stale: True if restored from disk}}
+        self.feed_cache = {}
+        # One keep-alive connection pool for every feed, plus per-URL ETag/Last-Modified
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=config.MAX_CONCURRENT_FEEDS))
+        self._validators = {}
+        # Cache for service alerts, indexed by route, and the processed form of
+        # each alert entity keyed by a hash of its bytes: {sha1: alert dict}
+        self._set_alerts([])
+        self._processed_alerts = {}
         self.alerts_last_fetch = 0
+        self.alerts_updated_at = 0
+        self.alerts_timestamp = 0
+        self.alerts_hash = None
+        self.alerts_stale = False
+        # When each feed's last good body was saved to SNAPSHOT_DIR: {url: timestamp}
+        self._snapshot_saved = {}
+        # Background refresher state: feeds (and alerts) kept warm off the request path.
+        # Feeds passed to watch_feeds or serving a configured station are always
+        # polled; any other is polled only while viewers keep asking for it
+        self.watched_feeds = set()
+        self._pinned_feeds = set()
+        self._station_feeds = set()
+        self._demand = {}  # {url: when a viewer last asked for it}
+        self._requested = {}  # {url: when this worker last registered it with the shared store}
+        # Stops to decode when SELECTIVE_DECODE is on, and their compiled wire pattern
+        self.watched_stops = set()
+        self._stop_pattern = None
+        self.watch_alerts = False
+        self._schedules = {}  # {url: FeedSchedule}
+        self._refresh_thread = None
+        self._refresh_wakeup = threading.Event()
+        self._refresh_stop = threading.Event()
+        # Bounded pool for fetching distinct feeds in parallel, plus the fetch
+        # already in flight for each URL so concurrent callers share it
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=config.MAX_CONCURRENT_FEEDS, thread_name_prefix="mta-fetch"
+        )
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Cross-process feed cache (see feed_store.py), opened by the background refresher.
+        # _published maps url -> updated_at last published to (or registered with) the store
+        self.shared_store = None
+        self._published = {}
+        # Optional history of every prediction at the watched stops (see arrivals_log.py)
+        self.recorder = None
+        if config.ARRIVALS_LOG_DIR:
+            self.recorder = ArrivalsRecorder(
+                config.ARRIVALS_LOG_DIR, config.ARRIVALS_LOG_MAX_BYTES, config.ARRIVALS_LOG_KEEP
+            )
+        # Bumped whenever any feed index or the alerts list changes
+        self.data_version = 0
+        self._data_changed = threading.Condition()
+
+    def start_background_refresh(self):
+        """
+        Start a daemon thread that keeps every watched feed warm.
+
+        Once running, request-path methods only read the latest snapshot and
+        never wait on the MTA network; feeds they ask for that aren't watched
+        yet are added to the watch list and fetched on the next pass.
+
+        With SHARED_CACHE_PATH set, only the process elected by the shared
+        store fetches; the others load its snapshots from disk.
+        """
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+
+        if config.SHARED_CACHE_PATH and self.shared_store is None:
+            self.shared_store = SharedFeedStore(config.SHARED_CACHE_PATH)
+
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="mta-feed-refresher", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_background_refresh(self):
+        """Stop the background refresher; fetching falls back to the request path."""
+        self._refresh_stop.set()
+        self._refresh_wakeup.set()
+        if self._refresh_thread:
+            self._refresh_thread.join(timeout=5)
+        self._refresh_thread = None
+
+    def is_background_refreshing(self):
+        """Return True if the background refresher owns all network fetches."""
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def watch_stations(self, stations, replace=False):
+        """
+        Make sure the feeds serving these stations are kept warm.
+
+        Args:
+            stations: List of station dicts with at least an 'id'
+            replace: True if this is the whole station configuration, so feeds
+                only serving stations that were removed go back to being
+                polled on demand
+        """
+        feed_urls = {
+            feed_url
+            for station in stations
+            for feed_url in get_feeds_for_station(station.get('id'))
+        }
+        self._station_feeds = feed_urls if replace else self._station_feeds | feed_urls
+        self._add_feeds(feed_urls)
+        # Watch both directions so switching a station's direction needs no re-decode
+        self.watch_stops(station.get('id') + direction for station in stations for direction in ('N', 'S'))
+
+    def watch_feeds(self, feed_urls):
+        """Keep feed URLs warm whether or not anyone is viewing them."""
+        self._pinned_feeds |= set(feed_urls)
+        self._add_feeds(feed_urls)
+
+    def _add_feeds(self, feed_urls):
+        """Add feed URLs to the background refresh set, waking the refresher for new ones."""
+        new_feeds = set(feed_urls) - self.watched_feeds
+        if new_feeds:
+            self.watched_feeds |= new_feeds
+            self._refresh_wakeup.set()
+
+    def note_demand(self, urls):
+        """
+        Record that a viewer just asked for these feeds (ALERTS_URL for alerts).
+
+        Feeds nobody has asked for in VIEWER_IDLE seconds stop being polled,
+        unless they serve a configured station; asking again resumes them.
+        """
+        now = time.time()
+        resumed = False
+        for url in urls:
+            if url == ALERTS_URL:
+                resumed |= not self.watch_alerts
+                self.watch_alerts = True
+            elif url not in self.watched_feeds:
+                self.watched_feeds.add(url)
+                resumed = True
+            resumed |= not self._is_wanted(url, now)
+            self._demand[url] = now
+        if resumed:
+            self._refresh_wakeup.set()
+
+    def _is_wanted(self, url, now):
+        """Return True if the refresher should keep polling a watched feed."""
+        if url in self._pinned_feeds or url in self._station_feeds:
+            return True
+        return now - self._demand.get(url, 0) < config.VIEWER_IDLE
+
+    def _schedule(self, url):
+        schedule = self._schedules.get(url)
+        if schedule is None:
+            cadence = ALERTS_CACHE_TTL if url == ALERTS_URL else config.DATA_REFRESH_RATE
+            schedule = self._schedules[url] = FeedSchedule(cadence)
+        return schedule
+
+    def _header_timestamp(self, url):
+        if url == ALERTS_URL:
+            return self.alerts_timestamp
+        return self.feed_cache.get(url, {}).get('timestamp')
+
+    def watch_stops(self, stop_ids):
+        """
+        Add stop_ids to the set decoded from each feed when SELECTIVE_DECODE is on.
+
+        Feeds that were selectively decoded without one of the new stops are
+        marked stale so the next fetch decodes them again in full.
+        """
+        new_stops = set(stop_ids) - self.watched_stops
+        if not new_stops:
+            return
+
+        self.watched_stops |= new_stops
+        self._stop_pattern = None
+
+        for url, entry in list(self.feed_cache.items()):
+            if entry.get('stops') is not None:
+                entry['hash'] = None
+                entry['timestamp'] = None
+                entry['last_fetch'] = 0
+                self._validators.pop(url, None)
+                self._schedule(url).next_due = 0
+        self._refresh_wakeup.set()
+
+    def _refresh_loop(self):
+        """Run refresh passes until stopped; a pass that fails is logged and retried."""
+        while not self._refresh_stop.is_set():
+            self._refresh_wakeup.clear()
+            try:
+                delay = self._refresh_pass()
+            except Exception as e:
+                # Keep the thread (and with it any leadership we hold) alive:
+                # a dead refresher would leave every worker serving frozen data
+                print(f"Error refreshing feeds in the background: {e}")
+                delay = config.REFRESH_MIN
+            self._refresh_wakeup.wait(max(0, delay))
+
+    def _refresh_pass(self):
+        """
+        Poll each wanted feed (and alerts) when its FeedSchedule expects an update.
+
+        Returns:
+            Seconds until the next pass is due
+        """
+        # Another process is the elected fetcher: just read what it publishes
+        if self.shared_store and not self.shared_store.try_lead():
+            try:
+                self._sync_from_shared_store()
+            except Exception as e:
+                print(f"Error reading shared feed cache: {e}")
+            return config.SHARED_CACHE_POLL
+
+        if self.shared_store:
+            # Feeds other workers serve count as viewed when they last registered them
+            for key, requested_at in self.shared_store.requested_feeds().items():
+                if key.startswith('stop:'):
+                    self.watch_stops([key[len('stop:'):]])
+                    continue
+                if key == ALERTS_URL:
+                    self.watch_alerts = True
+                else:
+                    self.watched_feeds.add(key)
+                self._demand[key] = max(self._demand.get(key, 0), requested_at or 0)
+
+        current_time = time.time()
+
+        # Feeds nobody is viewing or has configured aren't polled at all
+        # until note_demand wakes us. Request threads add to watched_feeds,
+        # so iterate over a copy
+        due_keys = [url for url in list(self.watched_feeds) if self._is_wanted(url, current_time)]
+        if self.watch_alerts and self._is_wanted(ALERTS_URL, current_time):
+            due_keys.append(ALERTS_URL)
+
+        due_now = [url for url in due_keys if self._schedule(url).next_due <= current_time]
+        if due_now:
+            refreshed = self.fetch_concurrently(due_now)
+            finished = time.time()
+            for url in due_now:
+                schedule = self._schedule(url)
+                if url in refreshed:
+                    schedule.updated(self._header_timestamp(url), finished)
+                    FEED_CADENCE.set(schedule.cadence, feed=FEED_NAMES.get(url, url))
+                else:
+                    schedule.failed(finished)
+
+        if self.shared_store:
+            try:
+                self._publish_to_shared_store(due_keys)
+            except Exception as e:
+                print(f"Error writing shared feed cache: {e}")
+
+        # With nothing wanted, still look again now and then for feeds going idle or requested
+        next_due = min(
+            (self._schedule(url).next_due for url in due_keys), default=current_time + config.REFRESH_MAX
+        )
+
+        # Check back often enough to notice feeds other processes request
+        if self.shared_store:
+            next_due = min(next_due, time.time() + config.SHARED_CACHE_POLL)
+
+        return next_due - time.time()
+
+    def _publish_to_shared_store(self, urls):
+        """Publish feeds (and alerts) that changed since they were last published."""
+        for url in urls:
+            if url == ALERTS_URL:
+                entry = {
+                    'timestamp': self.alerts_timestamp,
+                    'last_fetch': self.alerts_last_fetch,
+                    'updated_at': self.alerts_updated_at
+                }
+                payload = self.alerts_cache
+            else:
+                entry = self.feed_cache.get(url)
+                payload = entry['index'] if entry else None
+
+            # Snapshots restored from disk are only published once refreshed
+            if (url == ALERTS_URL and self.alerts_stale) or (entry and entry.get('stale')):
+                continue
+
+            if entry and entry['updated_at'] > self._published.get(url, 0):
+                self.shared_store.publish(url, entry, payload)
+                self._published[url] = entry['updated_at']
+
+    def _sync_from_shared_store(self):
+        """Register the feeds we serve with the fetcher and load its newer snapshots."""
+        now = time.time()
+        wanted = {url for url in list(self.watched_feeds) if self._is_wanted(url, now)}
+        wanted |= {'stop:' + stop_id for stop_id in list(self.watched_stops)}
+        if self.watch_alerts and self._is_wanted(ALERTS_URL, now):
+            wanted.add(ALERTS_URL)
+
+        # Register new feeds at once and renew the rest now and then, so the
+        # fetcher keeps polling them only while we still have viewers
+        due = {url for url in wanted if now - self._requested.get(url, 0) >= DEMAND_RENEW}
+        if due:
+            self.shared_store.request_feeds(due, now)
+            for url in due:
+                self._requested[url] = now
+
+        versions = {url: entry['updated_at'] for url, entry in self.feed_cache.items()}
+        versions[ALERTS_URL] = self.alerts_updated_at
+
+        for url, snapshot in self.shared_store.updated_since(versions).items():
+            if url == ALERTS_URL:
+                self._set_alerts(snapshot['payload'])
+                self.alerts_last_fetch = snapshot['last_fetch']
+                self.alerts_updated_at = snapshot['updated_at']
+                self.alerts_timestamp = snapshot['timestamp'] or 0
+            else:
+                self.feed_cache[url] = {
+                    'index': snapshot['payload'],
+                    'timestamp': snapshot['timestamp'],
+                    'hash': snapshot['hash'],
+                    'last_fetch': snapshot['last_fetch'],
+                    'updated_at': snapshot['updated_at']
+                }
+            self._mark_changed()
+
+    def _mark_changed(self):
+        """Bump data_version and wake everyone waiting in wait_for_change."""
+        with self._data_changed:
+            self.data_version += 1
+            self._data_changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """
+        Block until data_version moves past a version the caller has seen.
+
+        Args:
+            version: data_version the caller last acted on
+            timeout: Maximum seconds to wait
+
+        Returns:
+            The current data_version (unchanged if the wait timed out)
+        """
+        with self._data_changed:
+            self._data_changed.wait_for(lambda: self.data_version != version, timeout=timeout)
+            return self.data_version
+
+    def snapshot_version(self):
+        """
+        Version key for anything derived from the arrivals data.
+
+        Changes when a feed changes, and at least once per DATA_REFRESH_RATE
+        window so the relative "minutes away" values keep counting down.
+        """
+        return (self.data_version, int(time.time() // config.DATA_REFRESH_RATE))
+
+    def snapshot_expires_in(self):
+        """Seconds until snapshot_version rolls over to the next refresh window."""
+        return config.DATA_REFRESH_RATE - (time.time() % config.DATA_REFRESH_RATE)
+
+    def fetch_concurrently(self, urls):
+        """
+        Refresh several feeds in parallel on the bounded fetch pool.
+
+        Waits at most FEED_TIMEOUT seconds, so a cold multi-feed board costs
+        the slowest feed rather than the sum of all of them. Feeds that fail
+        or are still in flight keep their previous snapshot; a straggler
+        finishes in the background and lands in the cache when it's done.
+
+        Args:
+            urls: Feed URLs to refresh (ALERTS_URL refreshes the alerts cache)
+
+        Returns:
+            Set of URLs that were refreshed successfully
+        """
+        futures = {}
+        with self._inflight_lock:
+            for url in set(urls):
+                future = self._inflight.get(url)
+                if future is None or future.done():
+                    # Run in a copy of our context so the fetch shows up in
+                    # the requesting call's timing phases
+                    context = contextvars.copy_context()
+                    if url == ALERTS_URL:
+                        future = self._fetch_pool.submit(context.run, self._refresh_alerts)
+                    else:
+                        future = self._fetch_pool.submit(context.run, self._refresh_feed, url)
+                    self._inflight[url] = future
+                futures[future] = url
+
+        done, not_done = wait(futures, timeout=config.FEED_TIMEOUT)
+
+        refreshed = set()
+        for future in done:
+            if future.exception():
+                print(f"Error fetching {futures[future]}: {future.exception()}")
+            else:
+                refreshed.add(futures[future])
+        for future in not_done:
+            print(f"Timed out after {config.FEED_TIMEOUT}s waiting for {futures[future]}")
+
+        return refreshed
+
+    def _get_stop_index(self, feed_url, force_refresh=False):
+        """
+        Return the stop index for a feed, fetching it at most once per refresh window.
+
+        Every station and direction served by the same feed shares one download,
+        one ParseFromString and one indexing pass. Network and parse errors
+        propagate so callers can fall back to their own cached results.
+
+        While the background refresher is running this never touches the
+        network: it returns the latest snapshot, or an empty index if the feed
+        hasn't been fetched yet.
+        """
+        current_time = time.time()
+
+        cached = self.feed_cache.get(feed_url)
+
+        if self.is_background_refreshing() and not force_refresh:
+            self.note_demand([feed_url])
+            return cached['index'] if cached else {}
+
+        if not force_refresh and cached:
+            if current_time - cached['last_fetch'] < config.DATA_REFRESH_RATE:
+                return cached['index']
+
+        return self._refresh_feed(feed_url)
+
+    def _download(self, url):
+        """
+        GET a feed over the pooled session, revalidating with ETag/Last-Modified.
+
+        Validators are remembered only via _remember_validators, once the
+        body has been processed, so a 304 never refers to a body we failed
+        to parse.
+
+        Returns:
+            Tuple of (response, body bytes or None if the server answered 304)
+        """
+        headers = {}
+        validators = self._validators.get(url, {})
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        feed = FEED_NAMES.get(url, url)
+        with FETCH_SECONDS.time(feed=feed), timing.phase('network'):
+            response = self.session.get(url, headers=headers, timeout=config.FEED_TIMEOUT)
+            content = response.content
+        FEED_RESPONSES.inc(feed=feed, code=response.status_code)
+        FEED_BYTES.inc(len(content), feed=feed)
+
+        if response.status_code == 304:
+            FEED_UNCHANGED.inc(feed=feed, reason='not_modified')
+            return response, None
+        response.raise_for_status()
+
+        return response, content
+
+    def _remember_validators(self, url, response):
+        """Store a processed response's ETag/Last-Modified for the next conditional GET."""
+        self._validators[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+
+    def _refresh_feed(self, feed_url):
+        """
+        Download a feed and load it into the cache (see load_feed).
+
+        A 304 or a body identical to the cached one only marks the existing
+        index fresh, skipping the parse entirely. A body that doesn't decode
+        (e.g. truncated) raises like any fetch error, leaving the cached
+        index, validators and snapshot as they were.
+        """
+        print(f"Fetching MTA feed {feed_url}...")
+        cached = self.feed_cache.get(feed_url)
+        if cached and cached.get('stops') != self._decode_stops():
+            # A 304 would keep an index built for another set of stops
+            self._validators.pop(feed_url, None)
+        try:
+            response, content = self._download(feed_url)
+            cached = self.feed_cache.get(feed_url)
+
+            if cached and content is None:
+                cached['last_fetch'] = time.time()
+                return cached['index']
+
+            index = self.load_feed(feed_url, content)
+        except Exception as e:
+            FEED_ERRORS.inc(feed=FEED_NAMES.get(feed_url, feed_url), error=type(e).__name__)
+            raise
+
+        self._remember_validators(feed_url, response)
+        self._save_snapshot(feed_url, content)
+
+        # A fresh download replaces (or confirms) a snapshot restored from disk
+        if self.feed_cache[feed_url].pop('stale', False):
+            self._mark_changed()
+
+        return index
+
+    def load_feed(self, feed_url, content, record=True):
+        """
+        Parse and index a feed body, replacing the feed's cache entry.
+
+        An identical body or an unchanged header timestamp keeps the existing
+        index and only marks it fresh, skipping the parse and/or indexing
+        work. With SELECTIVE_DECODE on, only entities that touch a watched
+        stop are decoded (see build_watched_stop_index).
+
+        Args:
+            feed_url: Feed the body belongs to (a FEED_URLS value)
+            content: Serialized FeedMessage, as downloaded or from a fixture
+            record: Append the new predictions to the arrivals log, if enabled
+
+        Returns:
+            The feed's stop index
+        """
+        cached = self.feed_cache.get(feed_url)
+        name = FEED_NAMES.get(feed_url, feed_url)
+        parse_start = time.perf_counter()
+
+        # An index built for another set of watched stops (e.g. one added while
+        # this fetch was in flight) must be rebuilt even if the body is the same
+        stops = self._decode_stops()
+        content_hash = hashlib.sha1(content).digest()
+        if cached and cached['hash'] == content_hash and cached.get('stops') == stops:
+            FEED_UNCHANGED.inc(feed=name, reason='same_body')
+            cached['last_fetch'] = time.time()
+            return cached['index']
+
+        # Read from the header alone, so an unchanged feed is never fully parsed
+        timestamp = read_feed_timestamp(content)
+        if cached and timestamp and cached['timestamp'] == timestamp and cached.get('stops') == stops:
+            FEED_UNCHANGED.inc(feed=name, reason='same_timestamp')
+            cached['hash'] = content_hash
+            cached['last_fetch'] = time.time()
+            return cached['index']
+
+        if stops is not None:
+            index = build_watched_stop_index(content, stops, self._get_stop_pattern(stops))
+            entities = count_feed_entities(content)
+        else:
+            feed = gtfs_realtime_pb2.FeedMessage()
+            feed.ParseFromString(content)
+            index = build_stop_index(feed)
+            entities = len(feed.entity)
+
+        parse_time = time.perf_counter() - parse_start
+        PARSE_SECONDS.observe(parse_time, feed=name)
+        timing.record('parse', parse_time)
+        FEED_ENTITIES.set(entities, feed=name)
+
+        # Stamp after parsing so station results computed while the fetch
+        # was in flight are recognised as older than this snapshot
+        updated_at = time.time()
+        self.feed_cache[feed_url] = {
+            'index': index,
+            'timestamp': timestamp,
+            'hash': content_hash,
+            'stops': stops,
+            'last_fetch': updated_at,
+            'updated_at': updated_at
+        }
+        self._mark_changed()
+
+        if record and self.recorder is not None and self.watched_stops:
+            self.recorder.record(timestamp, index, self.watched_stops)
+
+        return index
+
+    def _save_snapshot(self, url, content):
+        """
+        Keep a feed's last good body in SNAPSHOT_DIR for restore_snapshots.
+
+        Written at most once per SNAPSHOT_INTERVAL per feed (the first fetch
+        after startup always is), replacing the previous file atomically.
+        """
+        if not config.SNAPSHOT_DIR or content is None:
+            return
+        current_time = time.time()
+        if current_time - self._snapshot_saved.get(url, 0) < config.SNAPSHOT_INTERVAL:
+            return
+
+        path = os.path.join(config.SNAPSHOT_DIR, f"{FEED_NAMES.get(url, 'feed')}.pb")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            self._snapshot_saved[url] = current_time
+        except OSError as e:
+            print(f"Error saving snapshot of {url}: {e}")
+
+    def restore_snapshots(self):
+        """
+        Load the last good feed bodies saved in SNAPSHOT_DIR, marked stale.
+
+        Call once at startup, after the stations are watched (so selective
+        decode keeps their stops) and before the refresher starts. Restored
+        feeds serve arrivals right away, flagged 'stale' until a fresh
+        download replaces them, and are due for refresh immediately.
+        Arrivals that have already passed are dropped as usual.
+
+        Returns:
+            Number of snapshots restored
+        """
+        if not config.SNAPSHOT_DIR:
+            return 0
+
+        restored = 0
+        for url in sorted(self.watched_feeds) + [ALERTS_URL]:
+            path = os.path.join(config.SNAPSHOT_DIR, f"{FEED_NAMES.get(url, 'feed')}.pb")
+            if url in self.feed_cache or (url == ALERTS_URL and self.alerts_updated_at):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                saved_at = os.path.getmtime(path)
+
+                if url == ALERTS_URL:
+                    self.load_alerts(content)
+                    self.alerts_last_fetch = 0
+                    self.alerts_updated_at = saved_at
+                    self.alerts_stale = True
+                else:
+                    # Already logged when it was downloaded
+                    self.load_feed(url, content, record=False)
+                    entry = self.feed_cache[url]
+                    entry['last_fetch'] = 0
+                    entry['updated_at'] = saved_at
+                    entry['stale'] = True
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Ignoring saved snapshot {path}: {e}")
+                continue
+
+            print(f"Restored {FEED_NAMES.get(url, url)} from {time.time() - saved_at:.0f}s ago")
+            restored += 1
+
+        return restored
+
+    def is_station_stale(self, station_id):
+        """Return True if any feed serving a station is still a snapshot restored from disk."""
+        return any(self.feed_cache.get(feed_url, {}).get('stale') for feed_url in get_feeds_for_station(station_id))
+
+    def _decode_stops(self):
+        """Stops load_feed decodes: the watched stops with SELECTIVE_DECODE on, else None (everything)."""
+        return frozenset(self.watched_stops) if config.SELECTIVE_DECODE and self.watched_stops else None
+
+    def _get_stop_pattern(self, stops):
+        """Return the compiled wire pattern for a stop set, reusing it while the set is unchanged."""
+        if self._stop_pattern is None or self._stop_pattern[0] != stops:
+            self._stop_pattern = (stops, compile_stop_pattern(stops))
+        return self._stop_pattern[1]
 
     def fetch_data(self):
         """Legacy method for single station fetch (backward compatibility)."""
-        if time.time() - self.last_fetch_time < config.DATA_REFRESH_RATE:
+        feed_fetch = self.feed_cache.get(config.FEED_URL, {}).get('updated_at', 0)
+        if time.time() - self.last_fetch_time < config.DATA_REFRESH_RATE and self.last_fetch_time >= feed_fetch:
             return
 
         try:
             print("Fetching new MTA data...")
-            response = requests.get(config.FEED_URL, timeout=10)
-            feed = gtfs_realtime_pb2.FeedMessage()
-            feed.ParseFromString(response.content)
+            stop_id = config.TARGET_STATION_ID + config.DIRECTION
+            upcoming = self.upcoming_arrivals(config.FEED_URL, stop_id, limit=6)
 
             arrivals = []
             current_time = time.time()
 
-            for entity in feed.entity:
-                if entity.trip_update:
-                    for update in entity.trip_update.stop_time_update:
-                        if update.stop_id == config.TARGET_STATION_ID + config.DIRECTION:
-                            arr_time = update.arrival.time
-                            if arr_time > current_time:
-                                minutes = int((arr_time - current_time) / 60)
-                                line = entity.trip_update.trip.route_id
-                                arrivals.append({'line': line, 'time': minutes})
-
-            arrivals.sort(key=lambda x: x['time'])
+            for arr_time, line in upcoming:
+                minutes = int((arr_time - current_time) / 60)
+                arrivals.append({'line': line, 'time': minutes})
 
             for i, arrival in enumerate(arrivals, 1):
                 arrival['rank'] = i
 
-            self.cached_arrivals = arrivals[:6]
+            self.cached_arrivals = arrivals
             self.last_fetch_time = current_time
 
         except Exception as e:
             print(f"Error fetching MTA data: {e}")
 
+    def upcoming_arrivals(self, feed_url, stop_id, limit=6):
+        """
+        Return the next arrivals at a stop, soonest first.
+
+        Reads the feed's stop index like every other lookup: fetched on
+        demand, or just the latest snapshot while the background refresher
+        runs (so this never blocks on the network then).
+
+        Returns:
+            List of (arrival_time, line) tuples, at most `limit` long
+        """
+        self.watch_stops([stop_id])
+        index = self._get_stop_index(feed_url)
+
+        upcoming = []
+        current_time = time.time()
+        for arr_time, line, trip_id in index.get(stop_id, []):
+            if arr_time > current_time:
+                upcoming.append((arr_time, line))
+                if len(upcoming) == limit:
+                    break
+
+        return upcoming
+
     def get_current_page(self):
         """Legacy method for single station display."""
         self.fetch_data()
@@ -194,39 +1168,42 @@ class MTAClient:
         cache_key = f"{station_id}_{direction}"
         current_time = time.time()
 
-        # Check cache
+        feed_urls = get_feeds_for_station(station_id)
+        self.watch_stops([station_id + direction])
+        if self.is_background_refreshing():
+            self.note_demand(feed_urls)
+
+        # Check cache, ignoring entries computed before the feeds' latest snapshots
         if not force_refresh and cache_key in self.station_cache:
             cached = self.station_cache[cache_key]
-            if current_time - cached['last_fetch'] < config.DATA_REFRESH_RATE:
+            feed_updated = max(self.feed_cache.get(feed_url, {}).get('updated_at', 0) for feed_url in feed_urls)
+            if current_time - cached['last_fetch'] < config.DATA_REFRESH_RATE and cached['last_fetch'] >= feed_updated:
+                CACHE_REQUESTS.inc(cache='station', result='hit')
                 return cached['arrivals']
 
-        feed_url = get_feed_for_station(station_id)
-
+        CACHE_REQUESTS.inc(cache='station', result='miss')
         try:
-            print(f"Fetching MTA data for station {station_id}{direction}...")
-            response = requests.get(feed_url, timeout=10)
-            feed = gtfs_realtime_pb2.FeedMessage()
-            feed.ParseFromString(response.content)
+            stop_id = station_id + direction
+            stop_arrivals = [
+                self._get_stop_index(feed_url, force_refresh=force_refresh).get(stop_id, [])
+                for feed_url in feed_urls
+            ]
 
             arrivals = []
-            stop_id = station_id + direction
 
-            for entity in feed.entity:
-                if entity.trip_update:
-                    for update in entity.trip_update.stop_time_update:
-                        if update.stop_id == stop_id:
-                            arr_time = update.arrival.time
-                            if arr_time > current_time:
-                                minutes = int((arr_time - current_time) / 60)
-                                line = entity.trip_update.trip.route_id
-                                destination = get_destination_for_line(line, direction)
-                                arrivals.append({
-                                    'line': line,
-                                    'time': minutes,
-                                    'destination': destination
-                                })
-
-            arrivals.sort(key=lambda x: x['time'])
+            # Index entries are sorted by arrival time, so merge the feeds'
+            # lists in order and stop after the top 10
+            for arr_time, line, trip_id in heapq.merge(*stop_arrivals):
+                if arr_time > current_time:
+                    minutes = int((arr_time - current_time) / 60)
+                    destination = get_destination_for_line(line, direction)
+                    arrivals.append({
+                        'line': line,
+                        'time': minutes,
+                        'destination': destination
+                    })
+                    if len(arrivals) == 10:
+                        break
 
             # Assign ranks
             for i, arrival in enumerate(arrivals, 1):
@@ -234,11 +1211,11 @@ class MTAClient:
 
             # Cache results
             self.station_cache[cache_key] = {
-                'arrivals': arrivals[:10],  # Keep top 10
+                'arrivals': arrivals,
                 'last_fetch': current_time
             }
 
-            return arrivals[:10]
+            return arrivals
 
         except Exception as e:
             print(f"Error fetching MTA data for {station_id}: {e}")
@@ -259,19 +1236,42 @@ class MTAClient:
         """
         results = {}
 
-        for config in station_configs:
-            station_id = config.get('id')
-            direction = config.get('direction', 'N')
-            name = config.get('name', station_id)
+        self.watch_stops(station.get('id') + station.get('direction', 'N') for station in station_configs)
 
-            arrivals = self.fetch_arrivals_for_station(station_id, direction)
+        # Refresh every stale feed the board needs in parallel up front, so
+        # the per-station lookups below are served from the feed cache
+        failed_feeds = set()
+        if not self.is_background_refreshing():
+            current_time = time.time()
+            stale_feeds = set()
+            for station in station_configs:
+                for feed_url in get_feeds_for_station(station.get('id')):
+                    cached = self.feed_cache.get(feed_url)
+                    if not cached or current_time - cached['last_fetch'] >= config.DATA_REFRESH_RATE:
+                        stale_feeds.add(feed_url)
+            if stale_feeds:
+                failed_feeds = stale_feeds - self.fetch_concurrently(stale_feeds)
+
+        for station in station_configs:
+            station_id = station.get('id')
+            direction = station.get('direction', 'N')
+            name = station.get('name', station_id)
 
             key = f"{station_id}_{direction}"
+
+            if failed_feeds.intersection(get_feeds_for_station(station_id)):
+                # Already failed or timed out above; don't retry it serially
+                cached = self.station_cache.get(key)
+                arrivals = cached['arrivals'] if cached else []
+            else:
+                arrivals = self.fetch_arrivals_for_station(station_id, direction)
+
             results[key] = {
                 'id': station_id,
                 'direction': direction,
                 'name': name,
-                'arrivals': arrivals
+                'arrivals': arrivals,
+                'stale': self.is_station_stale(station_id)
             }
 
         return results
@@ -288,73 +1288,19 @@ class MTAClient:
         """
         current_time = time.time()
 
+        if self.is_background_refreshing():
+            self.note_demand([ALERTS_URL])
+            CACHE_REQUESTS.inc(cache='alerts', result='hit' if self.alerts_updated_at else 'miss')
+            return self._filter_alerts(self.alerts_cache, lines_filter)
+
         # Check cache
         if current_time - self.alerts_last_fetch < ALERTS_CACHE_TTL:
+            CACHE_REQUESTS.inc(cache='alerts', result='hit')
             return self._filter_alerts(self.alerts_cache, lines_filter)
 
+        CACHE_REQUESTS.inc(cache='alerts', result='miss')
         try:
-            print("Fetching MTA service alerts...")
-            response = requests.get(ALERTS_URL, timeout=10)
-            feed = gtfs_realtime_pb2.FeedMessage()
-            feed.ParseFromString(response.content)
-
-            alerts = []
-
-            for entity in feed.entity:
-                if entity.HasField('alert'):
-                    alert = entity.alert
-
-                    # Extract affected routes
-                    routes = []
-                    for informed in alert.informed_entity:
-                        if informed.HasField('route_id'):
-                            route_id = informed.route_id
-                            if route_id and route_id not in routes:
-                                routes.append(route_id)
-
-                    # Extract header text
-                    header = ""
-                    if alert.header_text and alert.header_text.translation:
-                        for trans in alert.header_text.translation:
-                            if trans.language == 'en' or not trans.language:
-                                header = trans.text
-                                break
-
-                    # Extract description text
-                    description = ""
-                    if alert.description_text and alert.description_text.translation:
-                        for trans in alert.description_text.translation:
-                            if trans.language == 'en' or not trans.language:
-                                description = trans.text
-                                break
-
-                    # Extract active period
-                    active_period = {"start": None, "end": None}
-                    if alert.active_period:
-                        period = alert.active_period[0]
-                        if period.HasField('start'):
-                            active_period["start"] = period.start
-                        if period.HasField('end'):
-                            active_period["end"] = period.end
-
-                    # Determine severity based on header/description keywords
-                    severity = self._determine_severity(header, description)
-
-                    alert_data = {
-                        "id": entity.id,
-                        "header": header,
-                        "description": description,
-                        "routes": routes,
-                        "severity": severity,
-                        "active_period": active_period,
-                        "updated_at": current_time
-                    }
-
-                    alerts.append(alert_data)
-
-            self.alerts_cache = alerts
-            self.alerts_last_fetch = current_time
-
+            alerts = self._refresh_alerts()
             return self._filter_alerts(alerts, lines_filter)
 
         except Exception as e:
@@ -362,20 +1308,163 @@ class MTAClient:
             # Return cached alerts if available
             return self._filter_alerts(self.alerts_cache, lines_filter)
 
+    def _refresh_alerts(self):
+        """Download the alerts feed and load it into the alerts cache (see load_alerts)."""
+        print("Fetching MTA service alerts...")
+        try:
+            response, content = self._download(ALERTS_URL)
+
+            if content is None:
+                self.alerts_last_fetch = time.time()
+                return self.alerts_cache
+
+            alerts = self.load_alerts(content)
+        except Exception as e:
+            FEED_ERRORS.inc(feed='alerts', error=type(e).__name__)
+            raise
+
+        self._remember_validators(ALERTS_URL, response)
+        self._save_snapshot(ALERTS_URL, content)
+        self.alerts_stale = False
+
+        return alerts
+
+    def load_alerts(self, content):
+        """
+        Process an alerts feed body, replacing the alerts cache.
+
+        Args:
+            content: Serialized alerts FeedMessage, as downloaded or from a fixture
+
+        Returns:
+            List of alert dicts
+        """
+        current_time = time.time()
+        parse_start = time.perf_counter()
+
+        # Unchanged since the last parse: keep the processed alerts
+        content_hash = hashlib.sha1(content).digest()
+        if self.alerts_hash is not None and content_hash == self.alerts_hash:
+            FEED_UNCHANGED.inc(feed='alerts', reason='same_body')
+            self.alerts_last_fetch = current_time
+            return self.alerts_cache
+
+        # Reuse the processed form of every entity whose bytes (id included)
+        # are unchanged since the last refresh; only new or edited alerts are
+        # decoded and have their text, routes and severity extracted
+        alerts = []
+        processed = {}
+        timestamp = 0
+
+        for field_number, start, end in _iter_top_level_fields(content):
+            if field_number == FEED_HEADER_FIELD:
+                timestamp = gtfs_realtime_pb2.FeedHeader.FromString(content[start:end]).timestamp
+            if field_number != FEED_ENTITY_FIELD:
+                continue
+
+            raw = content[start:end]
+            key = hashlib.sha1(raw).digest()
+            if key in self._processed_alerts:
+                alert_data = self._processed_alerts[key]
+            else:
+                alert_data = self._process_alert(gtfs_realtime_pb2.FeedEntity.FromString(raw), current_time)
+
+            processed[key] = alert_data
+            if alert_data is not None:
+                alerts.append(alert_data)
+
+        parse_time = time.perf_counter() - parse_start
+        PARSE_SECONDS.observe(parse_time, feed='alerts')
+        timing.record('parse', parse_time)
+        FEED_ENTITIES.set(len(processed), feed='alerts')
+
+        self._processed_alerts = processed
+        self._set_alerts(alerts)
+        self.alerts_last_fetch = current_time
+        self.alerts_updated_at = current_time
+        self.alerts_timestamp = timestamp
+        self.alerts_hash = content_hash
+        self._mark_changed()
+
+        return alerts
+
+    def _process_alert(self, entity, current_time):
+        """Turn an alert entity into the API's alert dict (None for non-alert entities)."""
+        if not entity.HasField('alert'):
+            return None
+
+        alert = entity.alert
+
+        # Extract affected routes
+        routes = []
+        for informed in alert.informed_entity:
+            if informed.HasField('route_id'):
+                route_id = informed.route_id
+                if route_id and route_id not in routes:
+                    routes.append(route_id)
+
+        # Extract header text
+        header = ""
+        if alert.header_text and alert.header_text.translation:
+            for trans in alert.header_text.translation:
+                if trans.language == 'en' or not trans.language:
+                    header = trans.text
+                    break
+
+        # Extract description text
+        description = ""
+        if alert.description_text and alert.description_text.translation:
+            for trans in alert.description_text.translation:
+                if trans.language == 'en' or not trans.language:
+                    description = trans.text
+                    break
+
+        # Extract active period
+        active_period = {"start": None, "end": None}
+        if alert.active_period:
+            period = alert.active_period[0]
+            if period.HasField('start'):
+                active_period["start"] = period.start
+            if period.HasField('end'):
+                active_period["end"] = period.end
+
+        # Determine severity based on header/description keywords
+        severity = self._determine_severity(header, description)
+
+        return {
+            "id": entity.id,
+            "header": header,
+            "description": description,
+            "routes": routes,
+            "severity": severity,
+            "active_period": active_period,
+            "updated_at": current_time
+        }
+
+    def _set_alerts(self, alerts):
+        """Replace the alerts cache and rebuild its route -> alert positions index."""
+        by_route = {}
+        for position, alert in enumerate(alerts):
+            for route in alert.get("routes", []):
+                positions = by_route.setdefault(route.upper(), [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+
+        # One assignment, so readers never pair a list with another list's index
+        self._alerts = (alerts, by_route)
+
+    @property
+    def alerts_cache(self):
+        """The current list of alert dicts."""
+        return self._alerts[0]
+
     def _determine_severity(self, header, description):
         """Determine alert severity based on keywords."""
         text = (header + " " + description).lower()
 
-        major_keywords = ["suspended", "no service", "service suspended", "major delays"]
-        minor_keywords = ["delays", "delayed", "slow speeds", "signal problems"]
-
-        for keyword in major_keywords:
-            if keyword in text:
-                return "major"
-
-        for keyword in minor_keywords:
-            if keyword in text:
-                return "minor"
+        for severity, pattern in SEVERITY_PATTERNS:
+            if pattern.search(text):
+                return severity
 
         return "info"
 
@@ -385,7 +1474,15 @@ class MTAClient:
             return alerts
 
         # Normalize filter to uppercase
-        lines_filter = [line.upper() for line in lines_filter]
+        lines_filter = {line.upper() for line in lines_filter}
+
+        # The cached list has a route index: union the matching positions
+        cached, by_route = self._alerts
+        if alerts is cached:
+            positions = set()
+            for line in lines_filter:
+                positions.update(by_route.get(line, ()))
+            return [alerts[position] for position in sorted(positions)]
 
         filtered = []
         for alert in alerts:
@@ -397,10 +1494,28 @@ class MTAClient:
 
         return filtered
 
+    def update_age_metrics(self):
+        """Set the header age gauge for every cached feed (call right before rendering metrics)."""
+        now = time.time()
+        for url, entry in list(self.feed_cache.items()):
+            if entry.get('timestamp'):
+                FEED_HEADER_AGE.set(now - entry['timestamp'], feed=FEED_NAMES.get(url, url))
+        if self.alerts_timestamp:
+            FEED_HEADER_AGE.set(now - self.alerts_timestamp, feed='alerts')
+
     def clear_cache(self):
         """Clear all cached data."""
         self.station_cache = {}
+        self.feed_cache = {}
         self.cached_arrivals = []
         self.last_fetch_time = 0
-        self.alerts_cache = []
+        self._set_alerts([])
+        self._processed_alerts = {}
         self.alerts_last_fetch = 0
+        self.alerts_updated_at = 0
+        self.alerts_timestamp = 0
+        self.alerts_hash = None
+        self.alerts_stale = False
+        self._validators = {}
+        self._schedules = {}
+        self._refresh_wakeup.set()
@@ -0,0 +1,115 @@
+from bisect import bisect_left
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class StationSearchIndex:
+    """
+    Prebuilt search index over station names and IDs.
+
+    Everything that doesn't depend on the query (lowercased names, the lines
+    serving each stop, sorted prefix tables and an n-gram index for substring
+    matches) is computed once up front. A search then returns results in
+    four tiers, each ordered by name:
+
+    1. The station name starts with the query
+    2. The station ID starts with the query
+    3. A later word of the name starts with the query
+    4. The query appears anywhere else in the name or ID
+
+    and stops as soon as it has enough results.
+    """
+
+    def __init__(self, stations, lines_for_station):
+        """
+        Args:
+            stations: Dict mapping station ID to name (e.g. stations.STATIONS)
+            lines_for_station: Function returning the lines serving a station ID
+        """
+        self.entries = [
+            {'id': station_id, 'name': name, 'lines': lines_for_station(station_id)}
+            for station_id, name in sorted(stations.items(), key=lambda item: (item[1], item[0]))
+        ]
+
+        # Text a query can match against, per entry (same positions as self.entries)
+        self._names = [entry['name'].lower() for entry in self.entries]
+        self._ids = [entry['id'].lower() for entry in self.entries]
+
+        # Sorted (key, position) tables for prefix lookups
+        self._name_prefixes = sorted((name, pos) for pos, name in enumerate(self._names))
+        self._id_prefixes = sorted((station_id, pos) for pos, station_id in enumerate(self._ids))
+        self._word_prefixes = sorted(
+            (word, pos)
+            for pos, name in enumerate(self._names)
+            for word in name.replace('-', ' ').replace('/', ' ').split()[1:]
+        )
+
+        # n-gram -> positions, for every gram length up to NGRAM_SIZE so short
+        # queries can be looked up directly too
+        self._grams = {}
+        for pos in range(len(self.entries)):
+            text = self._names[pos] + '\0' + self._ids[pos]
+            for n in range(1, NGRAM_SIZE + 1):
+                for gram in _ngrams(text, n):
+                    self._grams.setdefault(gram, set()).add(pos)
+
+    def search(self, query, limit=50):
+        """
+        Return up to `limit` stations matching `query`, best matches first.
+
+        Returns:
+            List of dicts with id, name and lines
+        """
+        query = query.lower()
+        if not query:
+            return self.entries[:limit]
+
+        found = []
+        seen = set()
+
+        def take(positions):
+            for pos in sorted(positions):
+                if pos not in seen:
+                    seen.add(pos)
+                    found.append(self.entries[pos])
+                    if len(found) == limit:
+                        return True
+            return False
+
+        for table in (self._name_prefixes, self._id_prefixes, self._word_prefixes):
+            if take(self._prefix_matches(table, query)):
+                return found
+        take(self._substring_matches(query))
+
+        return found
+
+    def _prefix_matches(self, table, query):
+        positions = []
+        i = bisect_left(table, (query,))
+        while i < len(table) and table[i][0].startswith(query):
+            positions.append(table[i][1])
+            i += 1
+        return positions
+
+    def _substring_matches(self, query):
+        # Intersect the postings for the query's n-grams, rarest first,
+        # then confirm each candidate really contains the query
+        n = min(len(query), NGRAM_SIZE)
+        postings = sorted((self._grams.get(gram, set()) for gram in _ngrams(query, n)), key=len)
+        if not postings or not postings[0]:
+            return []
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+
+        return [
+            pos for pos in candidates
+            if query in self._names[pos] or query in self._ids[pos]
+        ]
@@ -0,0 +1,111 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+STAT_INTERVAL = 1.0  # Seconds between mtime checks for edits made by other processes
+
+
+class StationConfigStore:
+    """
+    In-memory copy of station_config.json with safe read-modify-write.
+
+    Reads are served from memory and revalidated against the file's mtime at
+    most once per STAT_INTERVAL, so the hot path does no file I/O. Writes
+    happen under an exclusive lock on a sidecar lock file, re-read the file
+    first so concurrent edits from other gunicorn workers aren't lost, and
+    replace the file atomically via a temp file and rename.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._config = None
+        self._version = None
+        self._checked_at = 0
+
+    @property
+    def version(self):
+        """Opaque value that changes whenever the file contents change."""
+        self.load()
+        return self._version
+
+    def load(self):
+        """
+        Return the current station configuration.
+
+        The returned dict is shared; treat it as read-only and make changes
+        through update().
+        """
+        now = time.monotonic()
+        if self._config is not None and now - self._checked_at < STAT_INTERVAL:
+            return self._config
+
+        with self._lock:
+            version = self._stat()
+            if self._config is None or version != self._version:
+                self._config = self._read()
+                self._version = version
+            self._checked_at = now
+            return self._config
+
+    @contextmanager
+    def update(self):
+        """
+        Lock the file, yield a fresh copy of the config to modify, then save it.
+
+        The file is only rewritten if the yielded config was actually changed.
+        """
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                config = self._read()
+                original = json.dumps(config, sort_keys=True)
+
+                yield config
+
+                if json.dumps(config, sort_keys=True) != original:
+                    self._write(config)
+                    with self._lock:
+                        self._config = config
+                        self._version = self._stat()
+                        self._checked_at = time.monotonic()
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+
+    def _read(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                pass
+        return {"stations": []}
+
+    def _write(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".station_config.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # A single-file bind mount (as in docker-compose.yml) can't be
+            # renamed over; fall back to rewriting it in place, still under
+            # the lock
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            with open(self.path, 'w') as f:
+                json.dump(config, f, indent=2)
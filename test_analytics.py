@@ -0,0 +1,66 @@
+"""
+Tests for analytics over the arrivals log.
+
+Run with: python3 -m pytest
+"""
+import numpy as np
+import analytics
+from arrivals_log import ArrivalsRecorder
+
+T0 = 1_790_000_000
+HEADWAY = 300
+
+
+def record_trains(directory, extra=()):
+    """
+    Log ten route 1 trains reaching 120N every HEADWAY seconds, seen by a
+    feed every 30 seconds, plus `extra` (arrival_time, route, trip) entries
+    in the first feed.
+    """
+    recorder = ArrivalsRecorder(str(directory), 1 << 20, 10)
+    arrivals = [T0 + i * HEADWAY for i in range(10)]
+    for n, timestamp in enumerate(range(T0 - 600, arrivals[-1] + 1, 30)):
+        index = {'120N': [(arrival, '1', f"t{i}") for i, arrival in enumerate(arrivals) if arrival >= timestamp]}
+        if n == 0:
+            index['120N'] = sorted(index['120N'] + list(extra))
+        assert recorder.record(timestamp, index, ['120N'])
+        recorder.flush(5)
+
+    store = analytics.HistoryStore(str(directory), 10 ** 9, refresh_interval=0)
+    store.refresh()
+    return store
+
+
+def test_headways(tmp_path):
+    store = record_trains(tmp_path)
+    columns = store.window(0)
+
+    [row] = analytics.headways(columns, store.names)
+    assert (row['stop'], row['route'], row['trains']) == ('120N', '1', 10)
+    assert row['median_min'] == row['mean_min'] == 5.0
+    assert analytics.gaps(columns, store.names) == []
+
+
+def test_zero_time_prediction_is_not_an_arrival(tmp_path):
+    store = record_trains(tmp_path, extra=[(0, '1', 'departure-only')])
+    columns = store.window(0)
+
+    [row] = analytics.headways(columns, store.names)
+    assert row['trains'] == 10
+    assert row['mean_min'] == 5.0
+    assert analytics.gaps(columns, store.names) == []
+
+
+def test_trip_arrivals_ignores_past_predictions():
+    # A run whose last prediction is for a time before it was made never arrived
+    columns = {
+        'feed_timestamp': np.array([T0, T0 + 30, T0], dtype=np.uint32),
+        'predicted': np.array([T0 + 60, T0 + 60, 0], dtype=np.uint32),
+        'stop': np.array([0, 0, 0], dtype=np.uint32),
+        'route': np.array([1, 1, 1], dtype=np.uint32),
+        'trip': np.array([2, 2, 3], dtype=np.uint32),
+    }
+    arrivals, group = analytics.trip_arrivals(columns)
+
+    assert arrivals['arrival'].tolist() == [T0 + 60]
+    assert group.tolist() == [0, 0, -1]
@@ -0,0 +1,109 @@
+"""
+Tests for mta_client's feed loading.
+
+Run with: python3 -m pytest
+"""
+import os
+import pytest
+from google.protobuf.message import DecodeError
+import config
+import feed_fixtures
+import mta_client
+
+FEED_URL = mta_client.FEED_URLS['123456S']
+STOPS = ['120N', '120S']
+NOW = 1_790_000_000
+
+
+class FakeResponse:
+    def __init__(self, etag):
+        self.headers = {'ETag': etag, 'Last-Modified': None}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(config, 'SNAPSHOT_INTERVAL', 0)
+    monkeypatch.setattr(config, 'SELECTIVE_DECODE', True)
+    client = mta_client.MTAClient()
+    client.recorder = None
+    client.watch_stops(STOPS)
+    return client
+
+
+def serve(client, content, etag):
+    """Make the client's next download return this body."""
+    client._download = lambda url: (FakeResponse(etag), content)
+
+
+def test_truncated_body_raises():
+    content = feed_fixtures.make_trip_feed('123456S', trips=200, now=NOW)
+    truncated = content[:len(content) // 2]
+
+    with pytest.raises(DecodeError):
+        list(mta_client._iter_top_level_fields(truncated))
+    with pytest.raises(DecodeError):
+        mta_client.build_watched_stop_index(truncated, set(STOPS))
+
+
+def test_truncated_body_leaves_cache_validators_and_snapshot(client, tmp_path):
+    good = feed_fixtures.make_trip_feed('123456S', trips=200, now=NOW)
+    serve(client, good, 'good')
+    index = client._refresh_feed(FEED_URL)
+    assert any(index.get(stop) for stop in STOPS)
+
+    entry = dict(client.feed_cache[FEED_URL])
+    snapshot = tmp_path / '123456S.pb'
+    assert snapshot.read_bytes() == good
+
+    newer = feed_fixtures.make_trip_feed('123456S', trips=200, now=NOW + 30)
+    serve(client, newer[:len(newer) - 100], 'truncated')
+    with pytest.raises(DecodeError):
+        client._refresh_feed(FEED_URL)
+
+    assert client.feed_cache[FEED_URL]['index'] is entry['index']
+    assert client.feed_cache[FEED_URL]['hash'] == entry['hash']
+    assert client._validators[FEED_URL]['etag'] == 'good'
+    assert snapshot.read_bytes() == good
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_truncated_alerts_leave_cache(client):
+    good = feed_fixtures.make_alerts_feed(now=NOW)
+    alerts = client.load_alerts(good)
+    assert alerts
+
+    with pytest.raises(DecodeError):
+        client.load_alerts(good[:len(good) - 10])
+    assert client.alerts_cache is alerts
+
+
+def test_departure_only_updates_are_not_indexed():
+    feed = mta_client.gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = '1.0'
+    feed.header.timestamp = NOW
+    trip_update = feed.entity.add(id='1').trip_update
+    trip_update.trip.trip_id = 'terminal'
+    trip_update.trip.route_id = '1'
+    departure_only = trip_update.stop_time_update.add(stop_id='101N')
+    departure_only.departure.time = NOW + 60
+    trip_update.stop_time_update.add(stop_id='103N').arrival.time = NOW + 180
+
+    index = mta_client.build_stop_index(feed)
+    assert '101N' not in index
+    assert index['103N'] == [(NOW + 180, '1', 'terminal')]
+
+    selective = mta_client.build_watched_stop_index(feed.SerializeToString(), {'101N', '103N'})
+    assert selective == index
+
+
+def test_unchanged_timestamp_skips_full_parse(client, monkeypatch):
+    monkeypatch.setattr(config, 'SELECTIVE_DECODE', False)
+    index = client.load_feed(FEED_URL, feed_fixtures.make_trip_feed('123456S', trips=200, now=NOW))
+
+    def parse(self, content):
+        raise AssertionError('feed with an unchanged timestamp was parsed')
+    monkeypatch.setattr(mta_client.gtfs_realtime_pb2.FeedMessage, 'ParseFromString', parse)
+
+    reshuffled = feed_fixtures.make_trip_feed('123456S', trips=200, now=NOW, seed=1)
+    assert client.load_feed(FEED_URL, reshuffled) is index
@@ -0,0 +1,181 @@
+"""
+Per-request phase timing and an opt-in sampling profiler.
+
+Code on the request path wraps its stages in phase() (or reports a duration
+it already measured with record()); the web app turns the totals into a
+Server-Timing header. Phases may nest, and work done for the request on
+the fetch pool adds up across threads, so phases can sum to more than the
+request's total.
+
+The SamplingProfiler periodically captures the stacks of threads serving
+tracked requests and writes those of slow requests as collapsed stacks
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and
+similar tools read directly.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_KEEP = 50         # Most recent profiles kept in the profile directory
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated seconds per phase for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start():
+    """Begin timing a request in the current context. Returns a token for stop()."""
+    return _current.set(RequestTimings())
+
+
+def stop(token):
+    """Stop timing the current request and return its RequestTimings."""
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+def record(name, seconds):
+    """Add an already-measured duration to a phase of the current request, if any."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Time the with block as a phase of the current request (a no-op outside requests)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start_time)
+
+
+def server_timing(timings):
+    """Format RequestTimings as a Server-Timing header value, in milliseconds."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.phases.items()]
+    entries.append(f"total;dur={timings.elapsed() * 1000:.2f}")
+    return ', '.join(entries)
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads that are serving tracked requests.
+
+    A single daemon thread wakes every PROFILE_INTERVAL while any request
+    is tracked and records each tracked thread's current stack. finish()
+    writes the samples of requests slower than the threshold to `directory`.
+    """
+
+    def __init__(self, threshold_ms, directory):
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self._samples = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def track(self):
+        """Start sampling the calling thread."""
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._active.set()
+
+    def untrack(self):
+        """Stop sampling the calling thread and return its samples (None if it wasn't tracked)."""
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+            if not self._samples:
+                self._active.clear()
+        return samples
+
+    def finish(self, name, elapsed):
+        """
+        Stop sampling the calling thread, saving its stacks if the request was slow.
+
+        Args:
+            name: Label for the profile file (e.g. the endpoint)
+            elapsed: Request duration in seconds
+
+        Returns:
+            Path of the written profile, or None
+        """
+        samples = self.untrack()
+        if not samples or elapsed < self.threshold:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'request'
+        path = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{safe_name}-{threading.get_ident()}.folded"
+        )
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self._prune()
+        print(f"Slow request {name} ({elapsed * 1000:.0f}ms): profile written to {path}")
+        return path
+
+    def _prune(self):
+        try:
+            profiles = sorted(
+                (entry for entry in os.scandir(self.directory) if entry.name.endswith('.folded')),
+                key=lambda entry: entry.stat().st_mtime
+            )
+        except OSError:
+            return
+        for entry in profiles[:-PROFILE_KEEP]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_collapse(frame)] += 1
+            del frames
+            time.sleep(PROFILE_INTERVAL)